@@ -0,0 +1,261 @@
+import re
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+# Request and database instrumentation for the customers API (app.py), rendered in the
+# Prometheus text format by render_metrics(). Observations are a lock plus a few additions,
+# so the overhead per request is a few microseconds.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1000, 10000, 100000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Per-request accumulator shared with the handler (and threadpool workers, which copy the context)
+current_request = ContextVar("current_request", default=None)
+
+
+class RequestStats:
+    __slots__ = ("db_seconds", "serialize_seconds", "queries", "rows")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.queries = 0
+        self.rows = 0
+
+
+class Histogram:
+    """Cumulative-bucket histogram family keyed by label values."""
+
+    def __init__(self, name, help_text, label_names, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (bucket_counts, total, count) in sorted(self._series.items()):
+                label_text = ",".join(f'{name}="{escape_label(value)}"'
+                                      for name, value in zip(self.label_names, labels))
+                prefix = label_text + "," if label_text else ""
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    cumulative += bucket_count
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {count}')
+                lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+                lines.append(f"{self.name}_count{{{label_text}}} {count}")
+        return lines
+
+
+request_duration = Histogram(
+    "http_request_duration_seconds", "Request latency by route", ("method", "route", "status"))
+request_phase = Histogram(
+    "http_request_phase_seconds",
+    "Request time by phase: db, serialize (JSON encoding of the response body with FAST_SERIALIZATION; "
+    "response_model encoding otherwise stays in app) and app (validation, handler code)",
+    ("method", "route", "phase"))
+request_rows = Histogram(
+    "http_request_db_rows", "Rows fetched from the database per request", ("method", "route"), ROW_BUCKETS)
+request_queries = Histogram(
+    "http_request_db_queries", "Statements executed per request", ("method", "route"), QUERY_BUCKETS)
+query_duration = Histogram(
+    "db_query_duration_seconds", "Statement execution plus fetch time by statement", ("statement",))
+query_rows = Histogram(
+    "db_query_rows", "Rows fetched per statement execution", ("statement",), ROW_BUCKETS)
+
+ALL_METRICS = (request_duration, request_phase, request_rows, request_queries, query_duration, query_rows)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def statement_label(sql):
+    """Low-cardinality label for a statement: whitespace collapsed, IN lists folded, truncated."""
+    sql = " ".join(sql.split())
+    sql = re.sub(r"IN \((%s, )*%s\)", "IN (...)", sql)
+    return sql[:120]
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in ALL_METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_db_time(statement, seconds, rows=None):
+    query_duration.observe((statement,), seconds)
+    if rows is not None:
+        query_rows.observe((statement,), rows)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_seconds += seconds
+        if rows is None:
+            stats.queries += 1
+        else:
+            stats.rows += rows
+
+
+def timed_serialization(function):
+    """Decorator counting function's run time as the current request's serialize phase."""
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        start_time = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            stats = current_request.get()
+            if stats is not None:
+                stats.serialize_seconds += time.perf_counter() - start_time
+    return wrapper
+
+
+class InstrumentedCursor:
+    """DB-API cursor wrapper timing execute/executemany/fetch* per statement."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self._statement = "unknown"
+
+    def execute(self, sql, params=()):
+        self._statement = statement_label(sql)
+        start_time = time.perf_counter()
+        try:
+            return self._cursor.execute(sql, params)
+        finally:
+            record_db_time(self._statement, time.perf_counter() - start_time)
+
+    def executemany(self, sql, seq_params):
+        self._statement = statement_label(sql)
+        start_time = time.perf_counter()
+        try:
+            return self._cursor.executemany(sql, seq_params)
+        finally:
+            record_db_time(self._statement, time.perf_counter() - start_time)
+
+    def _timed_fetch(self, fetch, single, *args):
+        start_time = time.perf_counter()
+        result = fetch(*args)
+        rows = int(result is not None) if single else len(result)
+        record_db_time(self._statement, time.perf_counter() - start_time, rows)
+        return result
+
+    def fetchone(self):
+        return self._timed_fetch(self._cursor.fetchone, True)
+
+    def fetchmany(self, size):
+        return self._timed_fetch(self._cursor.fetchmany, False, size)
+
+    def fetchall(self):
+        return self._timed_fetch(self._cursor.fetchall, False)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedAsyncCursor(InstrumentedCursor):
+    """InstrumentedCursor for aiomysql cursors, whose methods are coroutines."""
+
+    async def execute(self, sql, params=()):
+        self._statement = statement_label(sql)
+        start_time = time.perf_counter()
+        try:
+            return await self._cursor.execute(sql, params)
+        finally:
+            record_db_time(self._statement, time.perf_counter() - start_time)
+
+    async def executemany(self, sql, seq_params):
+        self._statement = statement_label(sql)
+        start_time = time.perf_counter()
+        try:
+            return await self._cursor.executemany(sql, seq_params)
+        finally:
+            record_db_time(self._statement, time.perf_counter() - start_time)
+
+    async def _timed_fetch(self, fetch, single, *args):
+        start_time = time.perf_counter()
+        result = await fetch(*args)
+        rows = int(result is not None) if single else len(result)
+        record_db_time(self._statement, time.perf_counter() - start_time, rows)
+        return result
+
+
+def instrumented_connection(get_connection):
+    """Wrap a get_db_connection-style context manager so it yields an InstrumentedCursor."""
+    @contextmanager
+    @wraps(get_connection)
+    def wrapper(*args, **kwargs):
+        with get_connection(*args, **kwargs) as (cursor, conn):
+            yield InstrumentedCursor(cursor), conn
+    return wrapper
+
+
+def instrumented_async_connection(get_connection):
+    """Async counterpart of instrumented_connection."""
+    @asynccontextmanager
+    @wraps(get_connection)
+    async def wrapper(*args, **kwargs):
+        async with get_connection(*args, **kwargs) as (cursor, conn):
+            yield InstrumentedAsyncCursor(cursor), conn
+    return wrapper
+
+
+class RequestMetricsMiddleware:
+    """ASGI middleware recording latency, DB/serialization/other time, queries and rows per route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+        start_time = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            current_request.reset(token)
+            elapsed = time.perf_counter() - start_time
+            # The router stores the matched route in the scope; templates keep label cardinality low
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            request_duration.observe((method, route, str(status)), elapsed)
+            request_phase.observe((method, route, "db"), stats.db_seconds)
+            request_phase.observe((method, route, "serialize"), stats.serialize_seconds)
+            request_phase.observe((method, route, "app"),
+                                  max(0.0, elapsed - stats.db_seconds - stats.serialize_seconds))
+            request_rows.observe((method, route), stats.rows)
+            request_queries.observe((method, route), stats.queries)
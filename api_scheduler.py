@@ -0,0 +1,280 @@
+import email.utils
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+
+import call_metrics
+from http_client import get_session
+
+logger = logging.getLogger(__name__)
+
+# Client-side scheduling for the completions API: token buckets keep requests and tokens per
+# minute under the quota, 429/5xx responses and connection errors (not read timeouts, whose
+# request may have been processed) are retried after Retry-After or a jittered exponential
+# backoff, and the number of calls in flight adapts AIMD-style: +1 per window of fast
+# successes, halved on 429, trimmed when latency climbs. The scheduler owns every retry; its
+# session has urllib3 retries off.
+# Set the limits to the deployment's quota.
+API_REQUESTS_PER_MINUTE = int(os.getenv("API_REQUESTS_PER_MINUTE", "300"))
+API_TOKENS_PER_MINUTE = int(os.getenv("API_TOKENS_PER_MINUTE", "150000"))
+API_MAX_CONCURRENCY = int(os.getenv("API_MAX_CONCURRENCY", os.getenv("MAX_CONCURRENCY", "8")))
+API_LATENCY_TARGET = float(os.getenv("API_LATENCY_TARGET", "30"))  # Seconds; slower calls shrink concurrency
+API_MAX_ATTEMPTS = int(os.getenv("API_MAX_ATTEMPTS", "6"))
+BACKOFF_BASE = 1.0  # Seconds before the first retry (before jitter)
+BACKOFF_CAP = 60.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+BURST_SECONDS = 10  # Bucket capacity; quotas are enforced over windows shorter than a minute
+
+# Rough prompt token cost per image once downscaled to 768px on the short side (4 tiles)
+IMAGE_TOKEN_ESTIMATE = 765
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Rate limit of per_minute units, allowing bursts of BURST_SECONDS worth."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * BURST_SECONDS)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1):
+        """Block until amount units are available (a request larger than a burst waits for a full bucket)."""
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def refund(self, amount):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on calls in flight between min_limit and max_limit."""
+
+    def __init__(self, max_limit, min_limit=1, latency_target=API_LATENCY_TARGET):
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.latency_target = latency_target
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def on_success(self, latency):
+        with self._condition:
+            if latency > self.latency_target:
+                self.limit = max(self.min_limit, self.limit * 0.9)
+            else:
+                # About +1 per `limit` successes, i.e. per round of calls in flight
+                self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+            self._condition.notify_all()
+
+    def on_throttled(self):
+        with self._condition:
+            now = time.monotonic()
+            # A burst of 429s from calls started together counts as one congestion signal
+            if now - self._last_decrease > 1.0:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+
+
+def retry_after_seconds(response):
+    """Delay requested by a Retry-After header (seconds or HTTP date), or None."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given 1-based retry attempt."""
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** (attempt - 1)))
+
+
+def estimate_tokens(payload):
+    """Tokens the quota will be charged for: prompt text, images and the max_tokens reservation."""
+    model_payload = payload.get("modelPayload", {})
+    images = 0
+    text_chars = 0
+    for message in model_payload.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            text_chars += len(content)
+            continue
+        for part in content or []:
+            if "image" in part:
+                images += 1
+            else:
+                text_chars += len(part.get("text", ""))
+    return text_chars // 4 + images * IMAGE_TOKEN_ESTIMATE + model_payload.get("max_tokens", 0)
+
+
+class CompletionsScheduler:
+    """Rate-limited, retrying, adaptively concurrent POSTs to the completions API."""
+
+    def __init__(self, requests_per_minute=API_REQUESTS_PER_MINUTE, tokens_per_minute=API_TOKENS_PER_MINUTE,
+                 max_concurrency=API_MAX_CONCURRENCY, max_attempts=API_MAX_ATTEMPTS):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency = AdaptiveConcurrency(max_concurrency)
+        self.max_attempts = max_attempts
+        self._paused_until = 0.0  # Set from Retry-After so every worker waits, not just the throttled one
+        self._stats_lock = threading.Lock()
+        self.counts = {"calls": 0, "attempts": 0, "throttled": 0, "server_errors": 0, "connection_errors": 0}
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.counts[name] += 1
+
+    def _wait_if_paused(self):
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def post(self, url, headers, payload, stream=False):
+        """POST payload as JSON and return the final response (success, non-retryable, or last attempt).
+
+        With stream=True the body is left unread for the caller to consume (completions_stream);
+        the call's slot is released once the headers arrive, and the caller hands the usage to
+        settle_usage() once the stream ends.
+        """
+        self._count("calls")
+        with call_metrics.phase("json_serialize"):
+            body = json.dumps(payload)
+        call_metrics.annotate(request_bytes=len(body))
+        headers = {**headers, "Content-Type": "application/json"}
+        estimate = estimate_tokens(payload)
+
+        for attempt in range(1, self.max_attempts + 1):
+            with call_metrics.phase("queue"):
+                self._wait_if_paused()
+                self.concurrency.acquire()
+            try:
+                with call_metrics.phase("queue"):
+                    self.request_bucket.acquire()
+                    self.token_bucket.acquire(estimate)
+                self._count("attempts")
+                call_metrics.annotate(attempts=1)
+                start_time = time.perf_counter()
+                try:
+                    response = get_session(retries=False).post(url, headers=headers, data=body, stream=stream)
+                    if not stream:
+                        call_metrics.end_transfer()
+                except requests.exceptions.ConnectionError as e:
+                    # Includes connect timeouts and dropped keep-alive connections. A read timeout
+                    # is not retried: the request was sent and may already be processed and billed.
+                    self._count("connection_errors")
+                    if attempt == self.max_attempts:
+                        raise
+                    delay = backoff_delay(attempt)
+                    logger.warning(f"API call failed ({e}); retry {attempt} in {delay:.1f}s")
+                    response = None
+                latency = time.perf_counter() - start_time
+            finally:
+                self.concurrency.release()
+
+            if response is None:
+                with call_metrics.phase("retry_backoff"):
+                    time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES:
+                if response.ok:  # A 4xx says nothing about capacity; only successes grow the limit
+                    self.concurrency.on_success(latency)
+                if not stream:
+                    self._settle_tokens(response, estimate)
+                return response
+
+            if response.status_code == 429:
+                self._count("throttled")
+                self.concurrency.on_throttled()
+            else:
+                self._count("server_errors")
+            if attempt == self.max_attempts:
+                return response
+
+            retry_after = retry_after_seconds(response)
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            if response.status_code == 429 and retry_after is not None:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            response.close()  # Hand the connection back to the pool (matters for unread streamed bodies)
+            logger.warning(f"API returned {response.status_code}; retry {attempt} in {delay:.1f}s "
+                           f"(concurrency limit {int(self.concurrency.limit)})")
+            with call_metrics.phase("retry_backoff"):
+                time.sleep(delay)
+
+    def _settle_tokens(self, response, estimate):
+        call_metrics.annotate(response_bytes=len(response.content))
+        try:
+            usage = response.json()["usage"]
+        except (ValueError, KeyError, TypeError):
+            return
+        self.settle_usage(usage, estimate)
+
+    def settle_usage(self, usage, estimate, fallback_used=None):
+        """Record the model-reported usage and give back the unused part of the token estimate.
+
+        fallback_used is the caller's own count, used when the response reported no usage.
+        """
+        used = fallback_used
+        if isinstance(usage, dict):
+            call_metrics.annotate(**{name: usage[name] for name in ("prompt_tokens", "completion_tokens", "total_tokens")
+                                     if isinstance(usage.get(name), int)})
+            if isinstance(usage.get("total_tokens"), int):
+                used = usage["total_tokens"]
+        if isinstance(used, int) and used < estimate:
+            self.token_bucket.refund(estimate - used)
+
+    def stats(self):
+        with self._stats_lock:
+            counts = dict(self.counts)
+        return {**counts, "concurrency_limit": round(self.concurrency.limit, 1)}
+
+
+def get_scheduler():
+    """The process-wide scheduler shared by every call_api, created on first use."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = CompletionsScheduler()
+    return _scheduler
@@ -1,11 +1,25 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List
-from contextlib import contextmanager
+from typing import Dict, List
+from contextlib import contextmanager, asynccontextmanager
+import os
+import asyncio
+import time
+import threading
+from collections import Counter
+import orjson
 import mysql.connector
+from mysql.connector import pooling
+from cache_backends import create_cache
+from api_metrics import (RequestMetricsMiddleware, instrumented_async_connection, instrumented_connection,
+                         render_metrics, timed_serialization)
 
 # FastAPI app
 app = FastAPI()
+# Per-route latency, DB/serialization/other time, queries and rows fetched, served on /metrics
+app.add_middleware(RequestMetricsMiddleware)
 
 # MySQL connection configuration
 db_config = {
@@ -16,16 +30,270 @@ db_config = {
     "port": 3306
 }
 
-# Context manager for MySQL connection
+# Connection pool configuration (mysql.connector allows at most 32 connections per pool)
+pool_config = {
+    "size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "timeout": float(os.getenv("DB_POOL_TIMEOUT", "5")),  # Seconds to wait for a free connection
+    "recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # Reconnect connections older than this
+    "ping_after_idle": int(os.getenv("DB_POOL_PING_AFTER_IDLE", "30")),  # Ping connections idle this long
+}
+
+# Read-through cache for GET /customers/{customer_id}: "memory" (in-process TTL/LRU), "redis" or "none"
+cache_config = {
+    "backend": os.getenv("CUSTOMER_CACHE", "memory"),
+    "max_entries": int(os.getenv("CUSTOMER_CACHE_SIZE", "10000")),
+    "ttl": float(os.getenv("CUSTOMER_CACHE_TTL", "60")),
+    "redis_url": os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+}
+customer_cache = create_cache(**cache_config)
+
+# Keyset pagination and NDJSON streaming for GET /customers/
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500  # Rows fetched from the server-side cursor per chunk
+CUSTOMER_COLUMNS = ("id", "name", "country_of_birth", "country_of_residence", "segment")
+
+# Encode customer rows straight to JSON with orjson instead of building a Customer per row and
+# having FastAPI validate it again against the response_model (same output, a fraction of the CPU)
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "1") == "1"
+
+# Bulk endpoints: records per request, and rows per multi-row statement (keeps packets small)
+BULK_MAX_RECORDS = 10000
+BULK_CHUNK_SIZE = 1000
+
+# Database driver: "sync" runs blocking mysql.connector calls on FastAPI's threadpool,
+# "async" runs aiomysql on the event loop so in-flight queries do not each hold a thread
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# Created at startup by init_db_pool() / init_async_db_pool()
+db_pool = None
+async_db_pool = None
+# Bounds concurrent borrowers so callers wait for a connection instead of failing on an empty pool
+pool_slots = None
+# MySQL connection id -> (created, last used) on the monotonic clock, for recycling and health checks
+connection_times = {}
+
+def init_db_pool():
+    global db_pool, pool_slots
+    db_pool = pooling.MySQLConnectionPool(
+        pool_name="customers_pool",
+        pool_size=pool_config["size"],
+        pool_reset_session=True,
+        consume_results=True,  # Unread rows (e.g. an abandoned stream) are drained before reuse
+        **db_config
+    )
+    pool_slots = threading.BoundedSemaphore(pool_config["size"])
+
+def checkout_connection():
+    """Borrow a pooled connection, reconnecting it if it is too old or fails a ping after idling."""
+    conn = db_pool.get_connection()
+    try:
+        now = time.monotonic()
+        created, last_used = connection_times.pop(conn.connection_id, (now, now))
+        if now - created > pool_config["recycle"]:
+            conn.reconnect(attempts=2, delay=0)
+            created = now
+        elif now - last_used > pool_config["ping_after_idle"]:
+            connection_id = conn.connection_id
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            if conn.connection_id != connection_id:
+                created = now
+        connection_times[conn.connection_id] = (created, now)
+        return conn
+    except mysql.connector.Error:
+        conn.close()  # Hand the slot back to the pool
+        raise
+
+async def init_async_db_pool():
+    global async_db_pool
+    import aiomysql  # Only needed in async mode
+    async_db_pool = await aiomysql.create_pool(
+        host=db_config["host"],
+        port=db_config["port"],
+        user=db_config["user"],
+        password=db_config["password"],
+        db=db_config["database"],
+        minsize=1,
+        maxsize=pool_config["size"],
+        pool_recycle=pool_config["recycle"],
+        # Single statements commit on their own; a connection left inside a transaction is
+        # closed by release() instead of going back to the pool
+        autocommit=True,
+    )
+
+# Context manager for MySQL connection borrowed from the pool; queries are timed per statement
+@instrumented_connection
 @contextmanager
 def get_db_connection():
-    conn = mysql.connector.connect(**db_config)
-    cursor = conn.cursor()
+    if not pool_slots.acquire(timeout=pool_config["timeout"]):
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
     try:
-        yield cursor, conn
+        conn = checkout_connection()
+        cursor = conn.cursor()
+        try:
+            yield cursor, conn
+        finally:
+            cursor.close()
+            created, _ = connection_times.get(conn.connection_id, (time.monotonic(), None))
+            connection_times[conn.connection_id] = (created, time.monotonic())
+            conn.close()  # Returns the connection to the pool
     finally:
-        cursor.close()
-        conn.close()
+        pool_slots.release()
+
+# Async context manager for an aiomysql connection, same (cursor, conn) shape as get_db_connection
+@instrumented_async_connection
+@asynccontextmanager
+async def get_async_db_connection(server_side=False):
+    import aiomysql
+    try:
+        conn = await asyncio.wait_for(async_db_pool.acquire(), pool_config["timeout"])
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Database connection pool exhausted")
+    try:
+        # SSCursor streams rows from the server instead of buffering the whole result
+        async with conn.cursor(aiomysql.SSCursor if server_side else aiomysql.Cursor) as cursor:
+            yield cursor, conn
+    finally:
+        async_db_pool.release(conn)
+
+def run_query(sql, params=(), fetch=None, commit=False):
+    """Run one statement on a pooled connection; returns all rows, one row, the new id or the rowcount."""
+    with get_db_connection() as (cursor, conn):
+        cursor.execute(sql, params)
+        if fetch == "all":
+            result = cursor.fetchall()
+        elif fetch == "one":
+            result = cursor.fetchone()
+        elif fetch == "lastrowid":
+            result = cursor.lastrowid
+        else:
+            result = cursor.rowcount
+        if commit:
+            conn.commit()
+        return result
+
+async def run_query_async(sql, params=(), fetch=None, commit=False):
+    """aiomysql counterpart of run_query."""
+    async with get_async_db_connection() as (cursor, conn):
+        await cursor.execute(sql, params)
+        if fetch == "all":
+            result = await cursor.fetchall()
+        elif fetch == "one":
+            result = await cursor.fetchone()
+        elif fetch == "lastrowid":
+            result = cursor.lastrowid
+        else:
+            result = cursor.rowcount
+        if commit:
+            await conn.commit()
+        return result
+
+async def query(sql, params=(), fetch=None, commit=False):
+    """Run one statement with the driver selected by DB_MODE without blocking the event loop."""
+    if DB_MODE == "async":
+        return await run_query_async(sql, params, fetch, commit)
+    return await run_in_threadpool(run_query, sql, params, fetch, commit)
+
+def run_transaction(steps):
+    """Run (method, sql, params) steps in one transaction; returns each step's rows or rowcount."""
+    with get_db_connection() as (cursor, conn):
+        try:
+            results = []
+            for method, sql, params in steps:
+                getattr(cursor, method)(sql, params)
+                results.append(cursor.fetchall() if cursor.description else cursor.rowcount)
+            conn.commit()
+            return results
+        except Exception:
+            conn.rollback()
+            raise
+
+async def run_transaction_async(steps):
+    """aiomysql counterpart of run_transaction."""
+    async with get_async_db_connection() as (cursor, conn):
+        await conn.begin()  # The pool runs in autocommit mode
+        try:
+            results = []
+            for method, sql, params in steps:
+                await getattr(cursor, method)(sql, params)
+                results.append(await cursor.fetchall() if cursor.description else cursor.rowcount)
+            await conn.commit()
+            return results
+        except Exception:
+            await conn.rollback()
+            raise
+
+async def transaction(steps):
+    """Run several statements atomically with the driver selected by DB_MODE."""
+    if DB_MODE == "async":
+        return await run_transaction_async(steps)
+    return await run_in_threadpool(run_transaction, steps)
+
+def chunked(items, size=BULK_CHUNK_SIZE):
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+def existing_ids_steps(ids):
+    """SELECT ... FOR UPDATE steps that lock and return which of `ids` already exist."""
+    return [("execute", f"SELECT id FROM customers WHERE id IN ({', '.join(['%s'] * len(chunk))}) FOR UPDATE",
+             tuple(chunk))
+            for chunk in chunked(ids)]
+
+def check_bulk_ids(ids):
+    if len(ids) > BULK_MAX_RECORDS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_RECORDS} records per request")
+    duplicates = sorted(customer_id for customer_id, count in Counter(ids).items() if count > 1)
+    if duplicates:
+        raise HTTPException(status_code=422, detail=f"Duplicate ids in request: {duplicates}")
+
+@timed_serialization
+def customer_json(row):
+    return orjson.dumps(dict(zip(CUSTOMER_COLUMNS, row)))
+
+@timed_serialization
+def customers_json(rows):
+    """JSON array of trusted customer rows, byte-identical to the response_model output."""
+    return orjson.dumps([dict(zip(CUSTOMER_COLUMNS, row)) for row in rows])
+
+@timed_serialization
+def ndjson_lines(rows):
+    return b"".join(orjson.dumps(dict(zip(CUSTOMER_COLUMNS, row))) + b"\n" for row in rows)
+
+def stream_customers(after):
+    """Yield customers with id > after as NDJSON chunks, reading an unbuffered cursor batch by batch."""
+    with get_db_connection() as (cursor, conn):
+        cursor.execute("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers "
+                       "WHERE id > %s ORDER BY id", (after,))
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            yield ndjson_lines(rows)
+
+async def stream_customers_async(after):
+    """aiomysql counterpart of stream_customers using a server-side cursor."""
+    async with get_async_db_connection(server_side=True) as (cursor, conn):
+        await cursor.execute("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers "
+                             "WHERE id > %s ORDER BY id", (after,))
+        while True:
+            rows = await cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            yield ndjson_lines(rows)
+
+async def cache_call(method, *args):
+    """Call a customer_cache method, off the event loop when the backend does network I/O."""
+    if customer_cache.blocking:
+        return await run_in_threadpool(getattr(customer_cache, method), *args)
+    return getattr(customer_cache, method)(*args)
+
+async def invalidate_customer(customer_id):
+    if customer_cache is not None:
+        await cache_call("delete", customer_id)
+
+async def invalidate_customers(customer_ids):
+    """Drop many cache entries in one call (a single DEL on Redis)."""
+    if customer_cache is not None:
+        await cache_call("delete_many", customer_ids)
 
 # Pydantic model for Customer
 class Customer(BaseModel):
@@ -38,69 +306,173 @@ class Customer(BaseModel):
     class Config:
         orm_mode = True  # This is necessary to allow FastAPI to read data from a database row
 
+class BulkResult(BaseModel):
+    id: int
+    status: str
+
+class BulkResponse(BaseModel):
+    counts: Dict[str, int]
+    results: List[BulkResult]  # One entry per submitted record, in request order
+
+class BulkDelete(BaseModel):
+    ids: List[int]
+
+def bulk_response(ids, statuses):
+    counts = {}
+    for status in statuses:
+        counts[status] = counts.get(status, 0) + 1
+    return {"counts": counts,
+            "results": [{"id": customer_id, "status": status} for customer_id, status in zip(ids, statuses)]}
+
 # Create table if not exists (run once to set up the database)
 @app.on_event("startup")
-def startup_db():
-    with get_db_connection() as (cursor, conn):
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS customers (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                name VARCHAR(100),
-                country_of_birth VARCHAR(50),
-                country_of_residence VARCHAR(50),
-                segment VARCHAR(50)
-            )
-        """)
-        conn.commit()
+async def startup_db():
+    if DB_MODE == "async":
+        await init_async_db_pool()
+    else:
+        init_db_pool()
+    await query("""
+        CREATE TABLE IF NOT EXISTS customers (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            name VARCHAR(100),
+            country_of_birth VARCHAR(50),
+            country_of_residence VARCHAR(50),
+            segment VARCHAR(50)
+        )
+    """, commit=True)
+
+@app.on_event("shutdown")
+async def shutdown_db():
+    if async_db_pool is not None:
+        async_db_pool.close()
+        await async_db_pool.wait_closed()
 
 # Create customer
 @app.post("/customers/", response_model=Customer)
-def create_customer(customer: Customer):
-    with get_db_connection() as (cursor, conn):
-        cursor.execute(
-            "INSERT INTO customers (name, country_of_birth, country_of_residence, segment) "
-            "VALUES (%s, %s, %s, %s)",
-            (customer.name, customer.country_of_birth, customer.country_of_residence, customer.segment)
-        )
-        conn.commit()
+async def create_customer(customer: Customer):
+    customer_id = await query(
+        "INSERT INTO customers (name, country_of_birth, country_of_residence, segment) "
+        "VALUES (%s, %s, %s, %s)",
+        (customer.name, customer.country_of_birth, customer.country_of_residence, customer.segment),
+        fetch="lastrowid", commit=True
+    )
+    if customer_cache is not None:
+        # Refresh rather than invalidate: a new customer is usually read right after creation
+        await cache_call("set", customer_id, [customer_id, customer.name, customer.country_of_birth,
+                                              customer.country_of_residence, customer.segment])
     return customer
 
-# Read all customers
+# Create or update many customers, keyed by id, in one transaction
+@app.post("/customers/bulk", response_model=BulkResponse)
+async def bulk_upsert_customers(customers: List[Customer]):
+    ids = [customer.id for customer in customers]
+    check_bulk_ids(ids)
+    if not customers:
+        return bulk_response([], [])
+
+    upsert_sql = (
+        "INSERT INTO customers (id, name, country_of_birth, country_of_residence, segment) "
+        "VALUES (%s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE name=VALUES(name), country_of_birth=VALUES(country_of_birth), "
+        "country_of_residence=VALUES(country_of_residence), segment=VALUES(segment)"
+    )
+    rows = [(customer.id, customer.name, customer.country_of_birth, customer.country_of_residence, customer.segment)
+            for customer in customers]
+    # executemany rewrites each chunk into a single multi-row INSERT
+    lookup_steps = existing_ids_steps(ids)
+    results = await transaction(lookup_steps + [("executemany", upsert_sql, chunk) for chunk in chunked(rows)])
+
+    existing = {row[0] for found in results[:len(lookup_steps)] for row in found}
+    await invalidate_customers(ids)
+    return bulk_response(ids, ["updated" if customer_id in existing else "created" for customer_id in ids])
+
+# Delete many customers by id in one transaction
+@app.post("/customers/bulk/delete", response_model=BulkResponse)
+async def bulk_delete_customers(request: BulkDelete):
+    ids = request.ids
+    check_bulk_ids(ids)
+    if not ids:
+        return bulk_response([], [])
+
+    lookup_steps = existing_ids_steps(ids)
+    delete_steps = [("execute", f"DELETE FROM customers WHERE id IN ({', '.join(['%s'] * len(chunk))})", tuple(chunk))
+                    for chunk in chunked(ids)]
+    results = await transaction(lookup_steps + delete_steps)
+
+    existing = {row[0] for found in results[:len(lookup_steps)] for row in found}
+    await invalidate_customers(ids)
+    return bulk_response(ids, ["deleted" if customer_id in existing else "not_found" for customer_id in ids])
+
+# Read customers a page at a time, ordered by id. Pass the X-Next-After header of a full page
+# as `after` to get the next one. With stream=true every customer after `after` is streamed as
+# NDJSON from a server-side cursor and `limit` is ignored.
 @app.get("/customers/", response_model=List[Customer])
-def get_customers():
-    with get_db_connection() as (cursor, conn):
-        cursor.execute("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers")
-        customers = cursor.fetchall()
-        return [Customer(id=id, name=name, country_of_birth=country_of_birth,
-                         country_of_residence=country_of_residence, segment=segment)
-                for id, name, country_of_birth, country_of_residence, segment in customers]
+async def get_customers(response: Response,
+                        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                        after: int = 0,
+                        stream: bool = False):
+    if stream:
+        chunks = stream_customers_async(after) if DB_MODE == "async" else stream_customers(after)
+        return StreamingResponse(chunks, media_type="application/x-ndjson")
+
+    customers = await query("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers "
+                            "WHERE id > %s ORDER BY id LIMIT %s", (after, limit), fetch="all")
+    headers = {"X-Next-After": str(customers[-1][0])} if len(customers) == limit else {}
+    if FAST_SERIALIZATION:
+        # Returning a Response skips the response_model validation and encoding
+        return Response(customers_json(customers), media_type="application/json", headers=headers)
+    response.headers.update(headers)
+    return [Customer(id=id, name=name, country_of_birth=country_of_birth,
+                     country_of_residence=country_of_residence, segment=segment)
+            for id, name, country_of_birth, country_of_residence, segment in customers]
 
 # Read customer by ID
 @app.get("/customers/{customer_id}", response_model=Customer)
-def get_customer(customer_id: int):
-    with get_db_connection() as (cursor, conn):
-        cursor.execute("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers WHERE id = %s", (customer_id,))
-        customer = cursor.fetchone()
+async def get_customer(customer_id: int):
+    customer = None
+    if customer_cache is not None:
+        customer = await cache_call("get", customer_id)
+        if customer is None:
+            fill_token = await cache_call("begin_fill", customer_id)
+    if customer is None:
+        customer = await query("SELECT id, name, country_of_birth, country_of_residence, segment FROM customers WHERE id = %s",
+                               (customer_id,), fetch="one")
         if not customer:
             raise HTTPException(status_code=404, detail="Customer not found")
-        return Customer(id=customer[0], name=customer[1], country_of_birth=customer[2],
-                        country_of_residence=customer[3], segment=customer[4])
+        if customer_cache is not None:
+            # Skipped if an update or delete invalidated the key while the row was being read
+            await cache_call("fill", customer_id, list(customer), fill_token)
+    if FAST_SERIALIZATION:
+        return Response(customer_json(customer), media_type="application/json")
+    return Customer(id=customer[0], name=customer[1], country_of_birth=customer[2],
+                    country_of_residence=customer[3], segment=customer[4])
 
 # Update customer
 @app.put("/customers/{customer_id}", response_model=Customer)
-def update_customer(customer_id: int, customer: Customer):
-    with get_db_connection() as (cursor, conn):
-        cursor.execute(
-            "UPDATE customers SET name=%s, country_of_birth=%s, country_of_residence=%s, segment=%s WHERE id=%s",
-            (customer.name, customer.country_of_birth, customer.country_of_residence, customer.segment, customer_id)
-        )
-        conn.commit()
-        return customer
+async def update_customer(customer_id: int, customer: Customer):
+    await query(
+        "UPDATE customers SET name=%s, country_of_birth=%s, country_of_residence=%s, segment=%s WHERE id=%s",
+        (customer.name, customer.country_of_birth, customer.country_of_residence, customer.segment, customer_id),
+        commit=True
+    )
+    await invalidate_customer(customer_id)
+    return customer
 
 # Delete customer
 @app.delete("/customers/{customer_id}")
-def delete_customer(customer_id: int):
-    with get_db_connection() as (cursor, conn):
-        cursor.execute("DELETE FROM customers WHERE id=%s", (customer_id,))
-        conn.commit()
+async def delete_customer(customer_id: int):
+    await query("DELETE FROM customers WHERE id=%s", (customer_id,), commit=True)
+    await invalidate_customer(customer_id)
     return {"message": "Customer deleted successfully"}
+
+# Cache hit/miss counters
+@app.get("/cache/stats")
+async def get_cache_stats():
+    if customer_cache is None:
+        return {"backend": "none"}
+    return customer_cache.stats()
+
+# Prometheus metrics
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,75 +1,41 @@
 import requests
-import base64
 import json
-import time
 import logging
 import os
+import hashlib
+import call_metrics
+from api_scheduler import get_scheduler
+from image_preprocessing import encode_image
+from response_cache import cached_response
+from token_provider import TokenProvider
+from vision_pipeline import log_batch_stats, run_batch
 
 # Azure AD Credentials
 TENANT_ID = "your_tenant_id"
 CLIENT_ID = "your_client_id"
 CLIENT_SECRET = "your_client_secret"
 SCOPE = "https://graph.microsoft.com/.default"
-TOKEN_URL = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
+TOKEN_URL = os.getenv("TOKEN_URL", f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token")
 
 # API Endpoint
-API_URL = "https://api.example.com/v1/completions"
+API_URL = os.getenv("API_URL", "https://api.example.com/v1/completions")
 
 # Token file path
 TOKEN_FILE_PATH = "token_info.json"
 
+# Batch settings: parallel API calls and the JSONL file results are appended to (rerun to resume)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+RESULTS_FILE = "azure_api_results.jsonl"
+
 # Set up logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Encode image to base64
-def encode_image(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode("utf-8")
-
-# Load token from file
-def load_token():
-    if os.path.exists(TOKEN_FILE_PATH):
-        with open(TOKEN_FILE_PATH, "r") as file:
-            return json.load(file)
-    return None
-
-# Save token to file
-def save_token(token_data):
-    with open(TOKEN_FILE_PATH, "w") as file:
-        json.dump(token_data, file)
-
-# Get OAuth Token
-def get_oauth_token():
-    token_info = load_token()
-    current_time = time.time()
-    
-    # Reuse token if valid
-    if token_info and current_time < token_info["expires_at"]:
-        logger.info("Reusing existing token.")
-        return token_info["access_token"]
-    
-    logger.info("Generating a new token.")
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "scope": SCOPE,
-        "grant_type": "client_credentials",
-    }
-    
-    response = requests.post(TOKEN_URL, data=payload)
-    response.raise_for_status()
-    token_data = response.json()
-    
-    # Save new token
-    token_info = {
-        "access_token": token_data["access_token"],
-        "expires_at": current_time + 3600  # 1 hour expiration
-    }
-    save_token(token_info)
-    return token_info["access_token"]
+# Shared OAuth token: in memory first, then TOKEN_FILE_PATH; refreshed in the background
+token_provider = TokenProvider(TOKEN_URL, CLIENT_ID, CLIENT_SECRET, SCOPE, TOKEN_FILE_PATH)
 
 # API call with Image and Prompt
+@call_metrics.timed_call("azure_api_call")
 def call_api(token, image_base64, system_content, user_content):
     headers = {
         "Authorization": f"Bearer {token}",
@@ -90,9 +56,13 @@ def call_api(token, image_base64, system_content, user_content):
         }
     }
     
-    response = requests.post(API_URL, headers=headers, json=data)
-    response.raise_for_status()
-    return response.json()
+    def send():
+        response = get_scheduler().post(API_URL, headers, data)
+        response.raise_for_status()
+        return response.json()
+
+    # Same images, prompts and parameters as an earlier call: answered from the response cache
+    return cached_response(data, send)
 
 # Main execution for multiple images
 def main():
@@ -111,14 +81,25 @@ def main():
             }
         ]
 
-        # Get OAuth token
-        token = get_oauth_token()
+        # Fetch the OAuth token up front; each call then reads it from memory (refreshed near expiry)
+        token_provider.get_token()
 
-        # Process each image
+        # Process the images concurrently; the same image with another prompt is a separate job
+        @call_metrics.timed_call("azure_api_call")  # Outer record, so the image encode is included
+        def analyze(job):
+            image_base64 = encode_image(job["path"])
+            return call_api(token_provider.get_token(), image_base64, job["system_content"], job["user_content"])
+
+        jobs = []
         for image_info in image_data:
-            image_base64 = encode_image(image_info["path"])
-            api_response = call_api(token, image_base64, image_info["system_content"], image_info["user_content"])
-            logger.info(f"Response for {image_info['path']}: {json.dumps(api_response, indent=4)}")
+            prompt_hash = hashlib.sha1((image_info["system_content"] + image_info["user_content"]).encode()).hexdigest()
+            jobs.append({"id": f"{image_info['path']}#{prompt_hash[:12]}", **image_info})
+
+        for record in run_batch(jobs, analyze, RESULTS_FILE, max_workers=MAX_CONCURRENCY):
+            if "result" in record:
+                logger.info(f"Response for {record['id']}: {json.dumps(record['result'], indent=4)}")
+
+        log_batch_stats(logger)
     
     except requests.exceptions.RequestException as e:
         logger.error(f"Error: {e}")
@@ -0,0 +1,235 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from latency_stats import percentile
+
+# Benchmark the customers API (app.py) under a mixed read/write workload and report
+# throughput and p50/p95/p99 latency per endpoint as JSON.
+#
+#   python benchmark_app.py --backend standin                 # embedded SQLite stand-in
+#   python benchmark_app.py --backend mysql --modes sync async  # database configured in app.py
+#
+# Each run gets its own server process. The stand-in runs app.py with get_db_connection
+# pointed at sqlite_standin (sync mode only).
+
+SEGMENTS = ["Retail", "SMB", "Enterprise", "Public"]
+COUNTRIES = ["US", "CA", "MX", "GB", "DE", "IN", "BR"]
+
+
+def serve_standin(port, db_path, db_latency_ms):
+    """Run app.py in this process with its database calls served by sqlite_standin."""
+    import uvicorn
+    import app
+    import sqlite_standin
+    from api_metrics import instrumented_connection
+
+    sqlite_standin.DB_PATH = db_path
+    sqlite_standin.QUERY_LATENCY = db_latency_ms / 1000
+    sqlite_standin.reset()
+
+    app.DB_MODE = "sync"
+    app.init_db_pool = lambda: None
+    app.get_db_connection = instrumented_connection(sqlite_standin.get_db_connection)
+    uvicorn.run(app.app, port=port, log_level="warning")
+
+
+def start_server(args, mode, port):
+    """Start the API for one benchmark run and wait until it answers."""
+    if args.backend == "standin":
+        command = [sys.executable, __file__, "serve", "--port", str(port),
+                   "--db-path", args.db_path, "--db-latency-ms", str(args.db_latency_ms)]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"]
+    server = subprocess.Popen(command, env={**os.environ, "DB_MODE": mode})
+
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/customers/1", timeout=1)
+            return server
+        except requests.exceptions.ConnectionError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Server in {mode} mode did not start on port {port}")
+
+
+def random_customer(rng, customer_id):
+    return {
+        "id": customer_id,
+        "name": f"Customer {customer_id}-{rng.randrange(1000)}",
+        "country_of_birth": rng.choice(COUNTRIES),
+        "country_of_residence": rng.choice(COUNTRIES),
+        "segment": rng.choice(SEGMENTS),
+    }
+
+
+def seed_customers(base_url, count):
+    """Load customers 1..count through the bulk endpoint."""
+    rng = random.Random(0)
+    session = requests.Session()
+    for start in range(1, count + 1, 1000):
+        batch = [random_customer(rng, customer_id) for customer_id in range(start, min(start + 1000, count + 1))]
+        session.post(f"{base_url}/customers/bulk", json=batch, timeout=60).raise_for_status()
+
+
+def make_operations(customer_count):
+    """Workload operations: name -> function(session, base_url, rng) returning a response."""
+    def get_customer(session, base_url, rng):
+        return session.get(f"{base_url}/customers/{rng.randint(1, customer_count)}", timeout=30)
+
+    def list_customers(session, base_url, rng):
+        return session.get(f"{base_url}/customers/",
+                           params={"limit": 100, "after": rng.randint(0, customer_count)}, timeout=30)
+
+    def create_customer(session, base_url, rng):
+        return session.post(f"{base_url}/customers/", json=random_customer(rng, 0), timeout=30)
+
+    def update_customer(session, base_url, rng):
+        customer_id = rng.randint(1, customer_count)
+        return session.put(f"{base_url}/customers/{customer_id}", json=random_customer(rng, customer_id), timeout=30)
+
+    def bulk_upsert(session, base_url, rng):
+        start = rng.randint(1, max(1, customer_count - 100))
+        batch = [random_customer(rng, customer_id) for customer_id in range(start, start + 100)]
+        return session.post(f"{base_url}/customers/bulk", json=batch, timeout=30)
+
+    return {
+        "get": get_customer,
+        "list": list_customers,
+        "create": create_customer,
+        "update": update_customer,
+        "bulk": bulk_upsert,
+    }
+
+
+def parse_mix(mix):
+    """'get=70,list=10' -> {'get': 70, 'list': 10}"""
+    weights = {}
+    for item in mix.split(","):
+        name, weight = item.split("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2) if latencies else None,
+    }
+
+
+def run_load(base_url, weights, operations, concurrency, duration, seed=0):
+    """Run the weighted mix from `concurrency` threads for `duration` seconds."""
+    names = list(weights)
+    latencies = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(worker_id):
+        rng = random.Random(seed * 100003 + worker_id)
+        session = requests.Session()
+        local_latencies = {name: [] for name in names}
+        local_errors = {name: 0 for name in names}
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights=[weights[name] for name in names])[0]
+            start_time = time.perf_counter()
+            try:
+                ok = operations[name](session, base_url, rng).status_code < 400
+            except requests.exceptions.RequestException:
+                ok = False
+            if ok:
+                local_latencies[name].append(time.perf_counter() - start_time)
+            else:
+                local_errors[name] += 1
+        with lock:
+            for name in names:
+                latencies[name].extend(local_latencies[name])
+                errors[name] += local_errors[name]
+
+    threads = [threading.Thread(target=worker, args=(worker_id,)) for worker_id in range(concurrency)]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start_time
+
+    all_latencies = [latency for name in names for latency in latencies[name]]
+    return {
+        "total": summarize(all_latencies, sum(errors.values()), elapsed),
+        "endpoints": {name: summarize(latencies[name], errors[name], elapsed) for name in names},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the customers API in app.py")
+    subparsers = parser.add_subparsers(dest="command")
+    serve_parser = subparsers.add_parser("serve", help="Run app.py against the SQLite stand-in")
+    serve_parser.add_argument("--port", type=int, default=8100)
+    serve_parser.add_argument("--db-path", default="benchmark_customers.db")
+    serve_parser.add_argument("--db-latency-ms", type=float, default=0.0)
+
+    parser.add_argument("--backend", choices=["standin", "mysql"], default="standin")
+    parser.add_argument("--modes", nargs="+", default=["sync"], help="DB_MODE values to compare (mysql backend)")
+    parser.add_argument("--mix", default="get=70,list=10,create=5,update=10,bulk=5")
+    parser.add_argument("--customers", type=int, default=10000, help="Customers loaded before the run")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--warmup", type=float, default=2)
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--db-path", default="benchmark_customers.db")
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="Stand-in delay per statement")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve_standin(args.port, args.db_path, args.db_latency_ms)
+        return
+
+    modes = ["sync"] if args.backend == "standin" else args.modes
+    weights = parse_mix(args.mix)
+    operations = make_operations(args.customers)
+    unknown = set(weights) - set(operations)
+    if unknown:
+        parser.error(f"Unknown operations in --mix: {sorted(unknown)}")
+
+    report = {
+        "config": {"backend": args.backend, "mix": weights, "customers": args.customers,
+                   "concurrency": args.concurrency, "duration": args.duration,
+                   "db_latency_ms": args.db_latency_ms if args.backend == "standin" else None},
+        "runs": {},
+    }
+    for offset, mode in enumerate(modes):
+        port = args.port + offset
+        server = start_server(args, mode, port)
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            seed_customers(base_url, args.customers)
+            run_load(base_url, weights, operations, args.concurrency, args.warmup, seed=1)  # Warm up the pools
+            report["runs"][mode] = run_load(base_url, weights, operations, args.concurrency, args.duration)
+        finally:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(report, indent=4))
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+# Read-through fills race with invalidation: a reader that missed can load a row, lose the CPU
+# while a writer commits and invalidates, and then store the old row. Readers therefore take a
+# token with begin_fill() before their read, and fill() stores the value only if the key was not
+# invalidated since.
+
+# Lua for RedisCache.fill(): SET only while the key's version is still the one read at the miss
+FILL_IF_UNCHANGED_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    blocking = False  # Lookups never leave the process
+
+    def __init__(self, max_entries=10000, ttl=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Invalidation counter, and key -> (version, expires_at) of recent invalidations
+        self._version = 0
+        self._tombstones = OrderedDict()
+        self._pruned_version = 0  # Newest version whose tombstone was dropped
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < now:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value)
+
+    def begin_fill(self, key):
+        with self._lock:
+            return self._version
+
+    def fill(self, key, value, token):
+        """Store value unless key was invalidated after begin_fill() returned token."""
+        with self._lock:
+            tombstone = self._tombstones.get(key)
+            if (tombstone is not None and tombstone[0] > token) or self._pruned_version > token:
+                return False
+            self._store(key, value)
+            return True
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        now = time.monotonic()
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+                self._version += 1
+                self._tombstones.pop(key, None)
+                self._tombstones[key] = (self._version, now + self.ttl)
+            # Tombstones only need to outlive the reads in flight; once one is dropped, fills
+            # that started before it are refused as a whole
+            while self._tombstones:
+                key, (version, expires_at) = next(iter(self._tombstones.items()))
+                if expires_at >= now and len(self._tombstones) <= self.max_entries:
+                    break
+                del self._tombstones[key]
+                self._pruned_version = version
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+            }
+
+
+class RedisCache:
+    """Cache shared by all worker processes through Redis; values are stored as JSON.
+
+    `client` only needs redis-py's get/set(px=)/delete/eval/pipeline, so a local stand-in can
+    replace it in tests. Each key has a "<key>:v" version counter that invalidation increments;
+    fill() sets the value only while the version is unchanged. Hit/miss counters are kept per
+    process.
+    """
+
+    blocking = True  # Every call is a network round trip
+
+    def __init__(self, client, ttl=60.0, prefix="customer:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(f"{self.prefix}{key}")
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return None if raw is None else json.loads(raw)
+
+    def set(self, key, value):
+        self.client.set(f"{self.prefix}{key}", json.dumps(value), px=int(self.ttl * 1000))
+
+    def begin_fill(self, key):
+        version = self.client.get(f"{self.prefix}{key}:v")
+        return version.decode() if isinstance(version, bytes) else (version or "")
+
+    def fill(self, key, value, token):
+        """Store value unless key was invalidated after begin_fill() returned token."""
+        name = f"{self.prefix}{key}"
+        return bool(self.client.eval(FILL_IF_UNCHANGED_SCRIPT, 2, name, f"{name}:v",
+                                     token, json.dumps(value), int(self.ttl * 1000)))
+
+    def delete(self, key):
+        self.delete_many([key])
+
+    def delete_many(self, keys):
+        """Remove all keys and bump their versions in a single round trip."""
+        names = [f"{self.prefix}{key}" for key in keys]
+        if not names:
+            return
+        pipeline = self.client.pipeline()
+        pipeline.delete(*names)
+        for name in names:
+            pipeline.incr(f"{name}:v")
+            # Versions only need to outlive the reads in flight
+            pipeline.pexpire(f"{name}:v", int(max(self.ttl, 60) * 1000))
+        pipeline.execute()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": "redis",
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+                "ttl_seconds": self.ttl,
+            }
+
+
+def create_cache(backend="memory", max_entries=10000, ttl=60.0, redis_url=None):
+    """Build the configured cache backend, or None when caching is disabled."""
+    if backend == "none":
+        return None
+    if backend == "redis":
+        import redis  # Only needed for the Redis backend
+        return RedisCache(redis.Redis.from_url(redis_url), ttl)
+    return TTLCache(max_entries, ttl)
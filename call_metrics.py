@@ -0,0 +1,177 @@
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from latency_stats import percentile
+
+# Per-call latency breakdown for the vision API calls. call_api functions are wrapped with
+# @timed_call(label); the helpers they go through add their phases to the calling thread's
+# record: image read/preprocess/base64 encode, JSON serialization, waiting in the scheduler,
+# DNS/TCP connect/TLS handshake/upload/time to first byte/transfer, retry backoff, plus request
+# and response bytes and the token usage the model reports. Each finished call is appended as
+# one JSON line to CALL_METRICS_FILE; summarize() (or `python call_metrics.py`) reports
+# percentiles and each phase's share of the total across a batch.
+CALL_METRICS_ENABLED = os.getenv("CALL_METRICS", "1") == "1"
+CALL_METRICS_FILE = os.getenv("CALL_METRICS_FILE", "vision_call_metrics.jsonl")
+
+PHASES = (
+    "image_read", "image_preprocess", "base64_encode", "json_serialize", "cache_lookup", "queue",
+    "dns", "tcp_connect", "tls_handshake", "upload", "ttfb", "transfer", "retry_backoff",
+)
+COUNTERS = ("attempts", "request_bytes", "response_bytes", "prompt_tokens", "completion_tokens", "total_tokens")
+
+_local = threading.local()
+_write_lock = threading.Lock()
+_batch_records = []  # Records of this process, for the end-of-run summary
+
+
+class CallRecord:
+    def __init__(self, label):
+        self.label = label
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.values = {"cache_hit": False}
+        self.headers_at = None  # perf_counter() when the response headers arrived
+
+    def as_dict(self, total):
+        return {
+            "ts": round(time.time(), 3),
+            "label": self.label,
+            "total": round(total, 6),
+            **{name: round(seconds, 6) for name, seconds in self.phases.items()},
+            **self.values,
+        }
+
+
+def current_record():
+    return getattr(_local, "record", None)
+
+
+def add_phase(name, seconds):
+    record = current_record()
+    if record is not None:
+        record.phases[name] += seconds
+
+
+def annotate(**values):
+    """Set values on the current record; counters (bytes, tokens, attempts) accumulate."""
+    record = current_record()
+    if record is None:
+        return
+    for name, value in values.items():
+        if name in COUNTERS:
+            record.values[name] = record.values.get(name, 0) + value
+        else:
+            record.values[name] = value
+
+
+def end_transfer():
+    """Count the time since the response headers arrived as body transfer."""
+    record = current_record()
+    if record is not None and record.headers_at is not None:
+        record.phases["transfer"] += time.perf_counter() - record.headers_at
+        record.headers_at = None
+
+
+@contextmanager
+def phase(name):
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_phase(name, time.perf_counter() - start_time)
+
+
+def write_record(record_dict):
+    with _write_lock:
+        _batch_records.append(record_dict)
+        with open(CALL_METRICS_FILE, "a") as metrics_file:
+            metrics_file.write(json.dumps(record_dict) + "\n")
+
+
+def timed_call(label):
+    """Decorator recording the latency breakdown of each call of the wrapped function."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not CALL_METRICS_ENABLED or current_record() is not None:
+                return func(*args, **kwargs)
+            record = _local.record = CallRecord(label)
+            start_time = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                record.values["error"] = type(e).__name__
+                raise
+            finally:
+                _local.record = None
+                write_record(record.as_dict(time.perf_counter() - start_time))
+            return result
+        return wrapper
+    return decorator
+
+
+_original_getaddrinfo = socket.getaddrinfo
+
+
+def _timed_getaddrinfo(*args, **kwargs):
+    if current_record() is None:
+        return _original_getaddrinfo(*args, **kwargs)
+    with phase("dns"):
+        return _original_getaddrinfo(*args, **kwargs)
+
+
+def install_dns_timing():
+    """Time name resolution for recorded calls (urllib3 resolves through socket.getaddrinfo)."""
+    socket.getaddrinfo = _timed_getaddrinfo
+
+
+def summarize(records):
+    """Per-phase mean/p50/p95 and share of total time, plus totals, over a list of call records."""
+    calls = [record for record in records if not record.get("cache_hit")]
+    total_seconds = sum(record["total"] for record in calls)
+    phases = {}
+    for name in ("total",) + PHASES:
+        values = sorted(record.get(name, 0.0) for record in calls)
+        if not values or (name != "total" and not any(values)):
+            continue
+        phases[name] = {
+            "mean_ms": round(sum(values) / len(values) * 1000, 1),
+            "p50_ms": round(percentile(values, 50) * 1000, 1),
+            "p95_ms": round(percentile(values, 95) * 1000, 1),
+            "share": round(sum(values) / total_seconds, 3) if total_seconds else None,
+        }
+    return {
+        "calls": len(records),
+        "cache_hits": len(records) - len(calls),
+        "errors": sum(1 for record in records if "error" in record),
+        "phases": phases,
+        "totals": {name: sum(record.get(name, 0) for record in calls) for name in COUNTERS},
+    }
+
+
+def batch_summary():
+    """Summary of the calls recorded by this process."""
+    with _write_lock:
+        return summarize(list(_batch_records))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize vision API call latency breakdowns")
+    parser.add_argument("path", nargs="?", default=CALL_METRICS_FILE)
+    parser.add_argument("--label", help="Only calls with this label")
+    args = parser.parse_args()
+
+    with open(args.path, "r") as metrics_file:
+        records = [json.loads(line) for line in metrics_file if line.strip()]
+    if args.label:
+        records = [record for record in records if record["label"] == args.label]
+    print(json.dumps(summarize(records), indent=4))
+
+
+if __name__ == "__main__":
+    main()
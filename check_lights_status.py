@@ -1,87 +1,46 @@
 import requests
-import base64
 import json
 import time
 import logging
 import os
+import call_metrics
+from api_scheduler import get_scheduler
+from completions_stream import log_stream, stream_completion
+from image_preprocessing import encode_image
+from response_cache import cached_response
+from token_provider import TokenProvider
+from vision_pipeline import log_batch_stats, run_batch
 
 # Azure AD Credentials
 TENANT_ID = os.getenv("TENANT_ID", "your_tenant_id")
 CLIENT_ID = os.getenv("CLIENT_ID", "your_client_id")
 CLIENT_SECRET = os.getenv("CLIENT_SECRET", "your_client_secret")
 SCOPE = "https://graph.microsoft.com/.default"
-TOKEN_URL = f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token"
+TOKEN_URL = os.getenv("TOKEN_URL", f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token")
 
 # API Endpoint
-API_URL = "https://api.example.com/v1/completions"
+API_URL = os.getenv("API_URL", "https://api.example.com/v1/completions")
 
 # Token file path
 TOKEN_FILE_PATH = "token_info.json"
 
+# Batch settings: parallel API calls and the JSONL file results are appended to (rerun to resume)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+# STREAM_RESPONSES=1 streams each answer and logs bullet points as they arrive (no RESULTS_FILE)
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+RESULTS_FILE = "lights_status_results.jsonl"
+
 # Set up logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Encode image to base64
-def encode_image(image_path):
-    """Encode image to base64 format"""
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode("utf-8")
-
-# Load token from file
-def load_token():
-    """Load OAuth token from file if exists"""
-    if os.path.exists(TOKEN_FILE_PATH):
-        with open(TOKEN_FILE_PATH, "r") as file:
-            return json.load(file)
-    return None
-
-# Save token to file
-def save_token(token_data):
-    """Save token data to file"""
-    with open(TOKEN_FILE_PATH, "w") as file:
-        json.dump(token_data, file)
-
-# Get OAuth Token
-def get_oauth_token():
-    """Get or refresh OAuth token"""
-    token_info = load_token()
-    current_time = time.time()
-    
-    # Reuse token if valid
-    if token_info and current_time < token_info["expires_at"]:
-        logger.info("Reusing existing token.")
-        return token_info["access_token"]
-    
-    logger.info("Generating a new token.")
-    payload = {
-        "client_id": CLIENT_ID,
-        "client_secret": CLIENT_SECRET,
-        "scope": SCOPE,
-        "grant_type": "client_credentials",
-    }
-    
-    response = requests.post(TOKEN_URL, data=payload)
-    response.raise_for_status()
-    token_data = response.json()
-    
-    # Save new token
-    token_info = {
-        "access_token": token_data["access_token"],
-        "expires_at": current_time + 3600  # 1 hour expiration
-    }
-    save_token(token_info)
-    return token_info["access_token"]
+# Shared OAuth token: in memory first, then TOKEN_FILE_PATH; refreshed in the background
+token_provider = TokenProvider(TOKEN_URL, CLIENT_ID, CLIENT_SECRET, SCOPE, TOKEN_FILE_PATH)
 
-# API call with multiple images in a single user role
-def call_api(token, image_paths):
-    """Call API to check lights status in multiple images"""
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json",
-    }
-    
-    # Convert all images to base64
+# Request payload with multiple images in a single user role
+def build_request(image_paths):
+    """Request payload to check lights status in multiple images"""
+    # Convert all images to base64 (downscaled and re-encoded first, see image_preprocessing)
     images_base64 = [{"image": encode_image(img)} for img in image_paths]
 
     # Construct single system and user role with multiple images
@@ -95,7 +54,7 @@ def call_api(token, image_paths):
             "content": images_base64 + [{"type": "text", "text": "Which lights are ON in these images of the AT&T Residential Gateway? Are any lights OFF?"}]
         }
     ]
-    
+
     data = {
         "domainName": "GenerativeAI",
         "modelName": "gpt-4o",
@@ -106,32 +65,67 @@ def call_api(token, image_paths):
             "max_tokens": 3000
         }
     }
-    
-    start_time = time.time()  # Start timing the API call
-    response = requests.post(API_URL, headers=headers, json=data)
-    end_time = time.time()  # End timing
-    
-    response_time = end_time - start_time
-    logger.info(f"API call completed in {response_time:.2f} seconds")
-    
-    response.raise_for_status()
-    return response.json()
+    return data
+
+# API call with multiple images in a single user role
+@call_metrics.timed_call("lights_status")
+def call_api(token, image_paths):
+    """Call API to check lights status in multiple images"""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+    data = build_request(image_paths)
+
+    def send():
+        start_time = time.time()  # Start timing the API call
+        response = get_scheduler().post(API_URL, headers, data)
+        end_time = time.time()  # End timing
+
+        response_time = end_time - start_time
+        logger.info(f"API call completed in {response_time:.2f} seconds")
+
+        response.raise_for_status()
+        return response.json()
+
+    # Same images, prompts and parameters as an earlier call: answered from the response cache
+    return cached_response(data, send)
+
+# Streaming API call: yields completions_stream events (first_token, text, bullet, done)
+def stream_api(token, image_paths):
+    """Stream the answer to check lights status in multiple images"""
+    headers = {"Authorization": f"Bearer {token}"}
+    return stream_completion(API_URL, headers, build_request(image_paths))
 
 # Main execution for multiple images
 def main():
     try:
-        # Image paths for multiple images of AT&T RG
-        image_paths = ["gateway_image1.jpg", "gateway_image2.jpg", "gateway_image3.jpg"]
+        # Image sets, one API call per set (each set holds multiple images of one AT&T RG)
+        image_sets = [
+            ["gateway_image1.jpg", "gateway_image2.jpg", "gateway_image3.jpg"],
+        ]
 
-        # Get OAuth token
+        # Fetch the OAuth token up front; each call then reads it from memory (refreshed near expiry)
         token_start = time.time()
-        token = get_oauth_token()
+        token_provider.get_token()
         token_end = time.time()
         logger.info(f"Token acquisition took {(token_end - token_start):.2f} seconds")
 
-        # Call the API with images to check light status
-        api_response = call_api(token, image_paths)
-        logger.info(f"API Response: {json.dumps(api_response, indent=4)}")
+        # Streaming mode: one image set at a time, bullet points logged as they arrive
+        if STREAM_RESPONSES:
+            for image_paths in image_sets:
+                log_stream(stream_api(token_provider.get_token(), image_paths), logger)
+            return
+
+        # Call the API for every image set concurrently to check light status
+        jobs = [{"id": ",".join(image_paths), "image_paths": image_paths} for image_paths in image_sets]
+        records = run_batch(jobs, lambda job: call_api(token_provider.get_token(), job["image_paths"]),
+                            RESULTS_FILE, max_workers=MAX_CONCURRENCY)
+        for record in records:
+            if "result" in record:
+                logger.info(f"API Response for {record['id']}: {json.dumps(record['result'], indent=4)}")
+
+        log_batch_stats(logger)
     
     except requests.exceptions.RequestException as e:
         logger.error(f"Error: {e}")
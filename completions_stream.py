@@ -0,0 +1,161 @@
+import argparse
+import json
+import re
+import time
+
+from api_scheduler import estimate_tokens, get_scheduler
+
+# Streaming (server-sent events) mode for the completions API. stream_completion() asks the API
+# for an incremental response and yields events as the text arrives:
+#   {"type": "first_token", "ttft": seconds}
+#   {"type": "text", "text": delta}
+#   {"type": "bullet", "bullet": text}       each bullet point once its line is complete
+#   {"type": "done", "text": full_text, "bullets": [...], "ttft": seconds, "total": seconds, "usage": {...}}
+# Try it against the stub server: python sse_stub_server.py, then
+#   python completions_stream.py --url http://127.0.0.1:8765/v1/completions
+
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+(.+?)\s*$")
+
+
+def sse_events(chunks):
+    """Data of each server-sent event in an iterable of byte chunks (split anywhere)."""
+    buffer = b""
+    data_lines = []
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            newline = buffer.find(b"\n")
+            if newline < 0:
+                break
+            line = buffer[:newline].rstrip(b"\r")
+            buffer = buffer[newline + 1:]
+            if not line:
+                if data_lines:
+                    yield "\n".join(data_lines)
+                    data_lines = []
+            elif line.startswith(b"data:"):
+                value = line[5:]
+                data_lines.append((value[1:] if value.startswith(b" ") else value).decode("utf-8"))
+            # Comments (": keep-alive"), event:, id: and retry: fields carry nothing we use
+    if data_lines:
+        yield "\n".join(data_lines)
+
+
+def parse_bullet(line):
+    match = BULLET_PATTERN.match(line)
+    return match.group(1) if match else None
+
+
+def parse_stream(chunks, start_time):
+    """Turn chat completion SSE chunks into text, bullet and timing events."""
+    parts = []
+    bullets = []
+    pending_line = ""
+    ttft = None
+    usage = None
+
+    for data in sse_events(chunks):
+        if data.strip() == "[DONE]":
+            break
+        chunk = json.loads(data)
+        usage = chunk.get("usage") or usage
+        choices = chunk.get("choices") or [{}]
+        delta = (choices[0].get("delta") or {}).get("content") or ""
+        if not delta:
+            continue
+        if ttft is None:
+            ttft = time.perf_counter() - start_time
+            yield {"type": "first_token", "ttft": ttft}
+        parts.append(delta)
+        yield {"type": "text", "text": delta}
+
+        *lines, pending_line = (pending_line + delta).split("\n")
+        for line in lines:
+            bullet = parse_bullet(line)
+            if bullet:
+                bullets.append(bullet)
+                yield {"type": "bullet", "bullet": bullet}
+
+    bullet = parse_bullet(pending_line)
+    if bullet:
+        bullets.append(bullet)
+        yield {"type": "bullet", "bullet": bullet}
+    yield {
+        "type": "done",
+        "text": "".join(parts),
+        "bullets": bullets,
+        "ttft": ttft,
+        "total": time.perf_counter() - start_time,
+        "usage": usage,
+    }
+
+
+def stream_completion(url, headers, payload):
+    """POST payload with streaming on and yield events as the response arrives.
+
+    The API must stream with chunked transfer encoding (as the completions API does), so each
+    chunk is handed over as soon as it is received. When the stream ends, the unused part of the
+    scheduler's token reservation is given back: from the reported usage, or estimated from the
+    text received if there is none (e.g. the stream was cut short).
+    """
+    model_payload = {**payload["modelPayload"], "stream": True, "stream_options": {"include_usage": True}}
+    payload = {**payload, "modelPayload": model_payload}
+    scheduler = get_scheduler()
+    estimate = estimate_tokens(payload)
+    start_time = time.perf_counter()
+    response = scheduler.post(url, {**headers, "Accept": "text/event-stream"}, payload, stream=True)
+    received_chars = 0
+    usage = None
+    try:
+        response.raise_for_status()
+        for event in parse_stream(response.iter_content(chunk_size=None), start_time):
+            if event["type"] == "text":
+                received_chars += len(event["text"])
+            elif event["type"] == "done":
+                usage = event["usage"]
+            yield event
+    finally:
+        response.close()
+        prompt_estimate = estimate - model_payload.get("max_tokens", 0)
+        scheduler.settle_usage(usage, estimate, fallback_used=prompt_estimate + received_chars // 4)
+
+
+def log_stream(events, logger):
+    """Log a stream_completion() as it arrives: time to first token, each bullet, then a summary."""
+    for event in events:
+        if event["type"] == "first_token":
+            logger.info(f"First token after {event['ttft']:.2f} seconds")
+        elif event["type"] == "bullet":
+            logger.info(f"- {event['bullet']}")
+        elif event["type"] == "done":
+            logger.info(f"Streamed {len(event['bullets'])} bullet points in {event['total']:.2f} seconds")
+            if not event["bullets"]:
+                logger.info(f"Answer: {event['text']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a text-only completion and print events as they arrive")
+    parser.add_argument("--url", default="http://127.0.0.1:8765/v1/completions")
+    parser.add_argument("--token", default="stub")
+    parser.add_argument("--prompt", default="List the ports of a residential gateway as bullet points.")
+    args = parser.parse_args()
+
+    payload = {
+        "domainName": "GenerativeAI",
+        "modelName": "gpt-4o",
+        "modelPayload": {
+            "messages": [{"role": "user", "content": [{"type": "text", "text": args.prompt}]}],
+            "max_tokens": 3000,
+        },
+    }
+    for event in stream_completion(args.url, {"Authorization": f"Bearer {args.token}"}, payload):
+        if event["type"] == "first_token":
+            print(f"[time to first token: {event['ttft'] * 1000:.0f} ms]")
+        elif event["type"] == "bullet":
+            print(f"* {event['bullet']}")
+        elif event["type"] == "done":
+            print(f"[{len(event['bullets'])} bullets, {len(event['text'])} chars in {event['total'] * 1000:.0f} ms]")
+
+
+if __name__ == "__main__":
+    main()
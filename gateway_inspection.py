@@ -0,0 +1,185 @@
+import requests
+import json
+import time
+import logging
+import os
+import call_metrics
+from api_scheduler import get_scheduler
+from image_preprocessing import encode_image
+from response_cache import cached_response
+from token_provider import TokenProvider
+from vision_pipeline import log_batch_stats, run_batch
+
+# Runs any selection of the README's gateway use cases (object, angle, lights, cables) in a
+# single API call per image set: the images are uploaded once, the model answers every
+# selected use case in one JSON object, and the answer is split back into one output per
+# use case.
+
+# Azure AD Credentials
+TENANT_ID = os.getenv("TENANT_ID", "your_tenant_id")
+CLIENT_ID = os.getenv("CLIENT_ID", "your_client_id")
+CLIENT_SECRET = os.getenv("CLIENT_SECRET", "your_client_secret")
+SCOPE = "https://graph.microsoft.com/.default"
+TOKEN_URL = os.getenv("TOKEN_URL", f"https://login.microsoftonline.com/{TENANT_ID}/oauth2/v2.0/token")
+
+# API Endpoint
+API_URL = os.getenv("API_URL", "https://api.example.com/v1/completions")
+
+# Token file path
+TOKEN_FILE_PATH = "token_info.json"
+
+# Batch settings: parallel API calls and the JSONL file results are appended to (rerun to resume)
+MAX_CONCURRENCY = int(os.getenv("MAX_CONCURRENCY", "8"))
+RESULTS_FILE = "gateway_inspection_results.jsonl"
+
+# Use cases answered per image set, e.g. USE_CASES=lights,cables
+USE_CASES = os.getenv("USE_CASES", "object,angle,lights,cables").split(",")
+
+# Per use case: what to check, and the JSON value expected under its key in the answer
+USE_CASE_SPECS = {
+    "object": {
+        "task": "Verify the images show an AT&T Residential Gateway and not something unexpected "
+                "(e.g., a dog, a cat, a face or an unrelated item).",
+        "schema": '{"is_gateway": true|false, "unexpected_objects": [string], "notes": string}',
+    },
+    "angle": {
+        "task": "Determine whether the images show the front, side, or back of the gateway.",
+        "schema": '{"view": "front"|"side"|"back"|"unknown", "notes": string}',
+    },
+    "lights": {
+        "task": "Identify the status of the gateway lights as ON or OFF, naming the specific lights "
+                "where possible.",
+        "schema": '{"lights": [{"name": string, "status": "ON"|"OFF"}], "notes": string}',
+    },
+    "cables": {
+        "task": "Identify all ports with cables plugged in; skip ports without cables.",
+        "schema": '{"cables": [{"port": string, "color": string, "type": string, '
+                  '"insertion": "fully seated"|"loose"}], "notes": string}',
+    },
+}
+
+# Set up logger
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Shared OAuth token: in memory first, then TOKEN_FILE_PATH; refreshed in the background
+token_provider = TokenProvider(TOKEN_URL, CLIENT_ID, CLIENT_SECRET, SCOPE, TOKEN_FILE_PATH)
+
+def build_messages(images_base64, use_cases):
+    """System and user messages asking for every selected use case in one JSON object."""
+    tasks = "\n".join(
+        f'- "{name}": {USE_CASE_SPECS[name]["task"]} Value: {USE_CASE_SPECS[name]["schema"]}'
+        for name in use_cases
+    )
+    system_content = (
+        "You are an AI assistant trained to analyze AT&T Residential Gateway (RG) images. "
+        "Complete each task below using all the images, and respond with only a JSON object "
+        "that has exactly one key per task, holding a value of the given shape:\n" + tasks
+    )
+    user_content = f"Analyze these gateway images and answer the tasks: {', '.join(use_cases)}."
+    return [
+        {"role": "system", "content": system_content},
+        {"role": "user", "content": images_base64 + [{"type": "text", "text": user_content}]},
+    ]
+
+def response_text(response):
+    """Assistant message text from a chat completions response."""
+    try:
+        return response["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise ValueError(f"Unexpected response shape: {json.dumps(response)[:200]}")
+
+def split_use_cases(response, use_cases):
+    """Parse the combined JSON answer into {use_case: output}; missing ones carry an error."""
+    text = response_text(response).strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text[text.index("\n") + 1:] if "\n" in text else text  # Drop the ```json line
+    answer = json.loads(text)
+    outputs = {}
+    for name in use_cases:
+        if name in answer:
+            outputs[name] = answer[name]
+        else:
+            outputs[name] = {"error": "missing from the model's answer"}
+    return outputs
+
+# API call with multiple images and every selected use case in a single user role
+@call_metrics.timed_call("gateway_inspection")
+def call_api(token, image_paths, use_cases):
+    """Call API once for all selected use cases and split the answer per use case"""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json",
+    }
+
+    # Convert all images to base64 (downscaled and re-encoded first, see image_preprocessing)
+    images_base64 = [{"image": encode_image(img)} for img in image_paths]
+
+    data = {
+        "domainName": "GenerativeAI",
+        "modelName": "gpt-4o",
+        "modelPayload": {
+            "messages": build_messages(images_base64, use_cases),
+            "response_format": {"type": "json_object"},
+            "temperature": 0.5,
+            "top_p": 0.95,
+            "max_tokens": 3000
+        }
+    }
+
+    def send():
+        start_time = time.time()
+        response = get_scheduler().post(API_URL, headers, data)
+        end_time = time.time()
+
+        response_time = end_time - start_time
+        logger.info(f"API call for {len(use_cases)} use cases completed in {response_time:.2f} seconds")
+
+        response.raise_for_status()
+        answer = response.json()
+        split_use_cases(answer, use_cases)  # Raise before caching, so a bad answer is retried next run
+        return answer
+
+    # Same images, prompts and parameters as an earlier call: answered from the response cache
+    return split_use_cases(cached_response(data, send), use_cases)
+
+# Main execution for multiple images
+def main():
+    unknown = [name for name in USE_CASES if name not in USE_CASE_SPECS]
+    if unknown:
+        raise SystemExit(f"Unknown use cases {unknown}; choose from {sorted(USE_CASE_SPECS)}")
+
+    try:
+        # Image sets, one API call per set (each set holds multiple images of one AT&T RG)
+        image_sets = [
+            ["gateway_image1.jpg", "gateway_image2.jpg", "gateway_image3.jpg"],
+        ]
+
+        # Fetch the OAuth token up front; each call then reads it from memory (refreshed near expiry)
+        token_start = time.time()
+        token_provider.get_token()
+        token_end = time.time()
+        logger.info(f"Token acquisition took {(token_end - token_start):.2f} seconds")
+
+        # One call per image set covering every selected use case; the selection is part of the
+        # job id so a rerun with other USE_CASES does not reuse these results
+        jobs = [{"id": f"{','.join(image_paths)}#{','.join(USE_CASES)}", "image_paths": image_paths}
+                for image_paths in image_sets]
+        records = run_batch(jobs, lambda job: call_api(token_provider.get_token(), job["image_paths"], USE_CASES),
+                            RESULTS_FILE, max_workers=MAX_CONCURRENCY)
+        for record in records:
+            if "result" in record:
+                for name, output in record["result"].items():
+                    logger.info(f"{name} for {record['id']}: {json.dumps(output, indent=4)}")
+
+        log_batch_stats(logger)
+
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Error: {e}")
+
+if __name__ == "__main__":
+    main_start = time.time()
+    main()
+    main_end = time.time()
+    logger.info(f"Total execution time: {(main_end - main_start):.2f} seconds")
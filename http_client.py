@@ -0,0 +1,142 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+
+import call_metrics
+
+# Shared HTTP session for the API scripts: keep-alive connections reused across calls and
+# threads (one TCP+TLS handshake per pooled connection instead of per call), default timeouts,
+# and retries with exponential backoff on connection errors and throttling/5xx responses
+# (never on read errors, so a request the server may have processed is not sent twice).
+# Connections report DNS/connect/TLS/upload/first-byte timings to call_metrics.
+POOL_CONNECTIONS = 10  # Hosts with a connection pool
+POOL_MAXSIZE = 32  # Connections kept per host; at least the scripts' MAX_CONCURRENCY
+DEFAULT_TIMEOUT = (5, 120)  # (connect, read) seconds; vision completions can take a while
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5  # 0.5s, 1s, 2s ... between attempts (Retry-After wins when sent)
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+_sessions = {}
+_session_lock = threading.Lock()
+
+
+def _recorded(*names):
+    """Seconds already recorded for these phases on the current call, 0 outside recorded calls."""
+    record = call_metrics.current_record()
+    return sum(record.phases[name] for name in names) if record else 0.0
+
+
+class TimedConnectionMixin:
+    """Adds DNS/TCP connect/upload/time-to-first-byte phases to the current call_metrics record.
+
+    Nested phases are subtracted, e.g. a lazy connect inside request() is not counted as upload.
+    """
+
+    def _new_conn(self):
+        before = _recorded("dns")
+        start_time = time.perf_counter()
+        try:
+            return super()._new_conn()
+        finally:
+            call_metrics.add_phase("tcp_connect", time.perf_counter() - start_time - (_recorded("dns") - before))
+
+    def request(self, *args, **kwargs):
+        before = _recorded("dns", "tcp_connect", "tls_handshake")
+        start_time = time.perf_counter()
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            nested = _recorded("dns", "tcp_connect", "tls_handshake") - before
+            call_metrics.add_phase("upload", time.perf_counter() - start_time - nested)
+
+    def getresponse(self, *args, **kwargs):
+        start_time = time.perf_counter()
+        response = super().getresponse(*args, **kwargs)
+        call_metrics.add_phase("ttfb", time.perf_counter() - start_time)
+        record = call_metrics.current_record()
+        if record is not None:
+            record.headers_at = time.perf_counter()
+        return response
+
+
+class TimedHTTPConnection(TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(TimedConnectionMixin, HTTPSConnection):
+    def connect(self):
+        before = _recorded("dns", "tcp_connect")
+        start_time = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            nested = _recorded("dns", "tcp_connect") - before
+            call_metrics.add_phase("tls_handshake", time.perf_counter() - start_time - nested)
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pooled connections report their phases to call_metrics."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+class TimeoutSession(requests.Session):
+    """Session that applies DEFAULT_TIMEOUT to calls that do not pass their own."""
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+        return super().request(method, url, **kwargs)
+
+
+def create_session(retries=True):
+    """Build a pooled session with the retry policy mounted for http and https.
+
+    With retries=False urllib3 retries nothing: connection errors are raised and 429/5xx
+    responses returned at once, for clients that schedule all their own retries (api_scheduler).
+    """
+    if retries:
+        retry = Retry(
+            total=RETRY_TOTAL,
+            # Never resend after the request went out and the response was lost (read error or read
+            # timeout): a POST may already have been processed and billed. Connection failures and
+            # 429/5xx answers are safe to retry since the server did not act on the request.
+            read=0,
+            backoff_factor=RETRY_BACKOFF_FACTOR,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]),
+            raise_on_status=False,  # Hand back the last response so callers' raise_for_status() reports it
+        )
+    else:
+        retry = Retry(total=0, raise_on_status=False)
+    call_metrics.install_dns_timing()
+    adapter = TimedHTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE, max_retries=retry)
+    session = TimeoutSession()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(retries=True):
+    """The process-wide shared session, created on first use."""
+    session = _sessions.get(retries)
+    if session is None:
+        with _session_lock:
+            session = _sessions.get(retries)
+            if session is None:
+                session = _sessions[retries] = create_session(retries)
+    return session
@@ -0,0 +1,148 @@
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import call_metrics
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; images are then sent as-is
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Image preparation for the vision scripts. gpt-4o scales every image to fit 2048x2048 and then
+# to 768px on the short side before looking at it, so anything larger is upload time for nothing.
+# Images are downscaled to those bounds, re-encoded as JPEG at IMAGE_QUALITY without EXIF, and
+# the result is cached by content hash: the most recently used images in memory, and in
+# IMAGE_CACHE_DIR, pruned of files unused for IMAGE_CACHE_MAX_AGE_DAYS and then of the least
+# recently used ones beyond IMAGE_CACHE_MAX_MB.
+PREPROCESS_IMAGES = os.getenv("PREPROCESS_IMAGES", "1") == "1"
+IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "2048"))
+IMAGE_SHORT_SIDE = int(os.getenv("IMAGE_SHORT_SIDE", "768"))
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", ".image_cache")
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "512"))
+IMAGE_CACHE_MAX_AGE_DAYS = float(os.getenv("IMAGE_CACHE_MAX_AGE_DAYS", "30"))
+IMAGE_MEMORY_CACHE_ENTRIES = int(os.getenv("IMAGE_MEMORY_CACHE_ENTRIES", "64"))
+
+# Image.info entries that carry metadata worth stripping (EXIF is checked with getexif())
+METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment", "photoshop")
+
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+_prune_lock = threading.Lock()
+
+if PREPROCESS_IMAGES and Image is None:
+    logger.warning("Pillow is not installed; images will be sent without preprocessing")
+
+
+def preprocess_image(image_bytes, max_dimension=IMAGE_MAX_DIMENSION, short_side=IMAGE_SHORT_SIDE,
+                     quality=IMAGE_QUALITY):
+    """Downscale to the model's working size and re-encode as a metadata-free JPEG."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        has_metadata = bool(image.getexif()) or any(name in image.info for name in METADATA_KEYS)
+        image = ImageOps.exif_transpose(image)  # Apply the camera rotation before EXIF is dropped
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        width, height = image.size
+        scale = min(1.0, max_dimension / max(width, height), short_side / min(width, height))
+        if scale < 1.0:
+            image = image.resize((max(1, round(width * scale)), max(1, round(height * scale))), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format="JPEG", quality=quality, optimize=True)
+    processed = output.getvalue()
+    # A small, already well-compressed photo can grow when re-encoded; keep the original then,
+    # unless it carries metadata (EXIF GPS from the technicians' phones must not be uploaded)
+    if has_metadata or len(processed) < len(image_bytes):
+        return processed
+    return image_bytes
+
+
+def prune_disk_cache(cache_dir=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_MB * 1024 * 1024,
+                     max_age=IMAGE_CACHE_MAX_AGE_DAYS * 86400):
+    """Delete cached images unused for max_age seconds, then the least recently used beyond max_bytes."""
+    if not _prune_lock.acquire(blocking=False):
+        return  # Another thread is already pruning
+    try:
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.name.endswith(".jpg"):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Removed by another process meanwhile
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        cutoff = time.time() - max_age
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+    finally:
+        _prune_lock.release()
+
+
+def load_image(image_path):
+    """Bytes to send for image_path: preprocessed and cached when enabled, raw otherwise."""
+    with call_metrics.phase("image_read"):
+        with open(image_path, "rb") as img_file:
+            image_bytes = img_file.read()
+    if not PREPROCESS_IMAGES or Image is None:
+        return image_bytes
+
+    settings = f"{IMAGE_MAX_DIMENSION}:{IMAGE_SHORT_SIDE}:{IMAGE_QUALITY}".encode()
+    key = hashlib.sha256(settings + image_bytes).hexdigest()
+    with _memory_cache_lock:
+        processed = _memory_cache.get(key)
+        if processed is not None:
+            _memory_cache.move_to_end(key)
+    if processed is not None:
+        return processed
+
+    cache_path = os.path.join(IMAGE_CACHE_DIR, key + ".jpg")
+    try:
+        with call_metrics.phase("image_read"):
+            with open(cache_path, "rb") as cache_file:
+                processed = cache_file.read()
+    except FileNotFoundError:
+        processed = None
+    else:
+        try:
+            os.utime(cache_path)  # The mtime marks the last use for pruning
+        except OSError:
+            pass
+    if processed is None:
+        with call_metrics.phase("image_preprocess"):
+            processed = preprocess_image(image_bytes)
+        logger.info(f"Preprocessed {image_path}: {len(image_bytes)} -> {len(processed)} bytes")
+        os.makedirs(IMAGE_CACHE_DIR, exist_ok=True)
+        temp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as cache_file:
+            cache_file.write(processed)
+        os.replace(temp_path, cache_path)
+        prune_disk_cache()
+
+    with _memory_cache_lock:
+        _memory_cache[key] = processed
+        _memory_cache.move_to_end(key)
+        while len(_memory_cache) > IMAGE_MEMORY_CACHE_ENTRIES:
+            _memory_cache.popitem(last=False)
+    return processed
+
+
+def encode_image(image_path):
+    """Encode image to base64 format"""
+    image_bytes = load_image(image_path)
+    with call_metrics.phase("base64_encode"):
+        return base64.b64encode(image_bytes).decode("utf-8")
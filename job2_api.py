@@ -1,4 +1,5 @@
 import requests
+from http_client import get_session
 from logging_config import get_job_logger, log_execution_time
 
 # Create logger for Job2
@@ -15,7 +16,7 @@ def call_api(valid=True):
         url = "https://jsonplaceholder.typicode.com/invalid_endpoint"  # Invalid URL
 
     try:
-        response = requests.get(url)
+        response = get_session().get(url)
         response.raise_for_status()
         logger.info(f"API Response: {response.json()}")
     except requests.RequestException as e:
@@ -0,0 +1,10 @@
+# Summary statistics shared by the benchmark (benchmark_app.py) and the vision call metrics
+# (call_metrics.py).
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1)
+    return sorted_values[max(0, index)]
@@ -1,7 +1,23 @@
 import cx_Oracle
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import os
+import io
+import csv
+import glob
+import gzip
+import json
+import time
+import queue
+import shutil
+import decimal
+import hashlib
+import threading
 import multiprocessing
+from multiprocessing.pool import ThreadPool
+from collections import Counter
+from datetime import datetime, timedelta
 
 # Initialize Oracle client
 cx_Oracle.init_oracle_client(lib_dir=r"C:\Users\muppa\instantclient_21_12")
@@ -21,51 +37,955 @@ custom_tables = ["SAMPLE_TABLE", "EMPLOYEES", "ORDERS"]  # Replace with your act
 output_dir = "oracle_selected_tables_csv"
 os.makedirs(output_dir, exist_ok=True)
 
-# Create a connection pool for better performance
-POOL_SIZE = min(4, len(custom_tables))  # Adjust number of connections dynamically
-pool = cx_Oracle.SessionPool(min=POOL_SIZE, max=POOL_SIZE * 2, increment=1, **DB_CONFIG)
+# Output engine: "csv" (csv.writer when streaming) or "parquet" (pyarrow, one row group per fetch batch)
+OUTPUT_FORMAT = "csv"
+PARQUET_COMPRESSION = "snappy"  # "snappy", "zstd", "gzip" or None
 
-def fetch_and_write_table(table):
-    """Fetch data from a table and write it to a CSV file efficiently."""
+# CSV part files: compress on a background writer thread while the next batch is fetched, and
+# cut the output into numbered parts (at fetch batch boundaries) listed in a manifest with
+# per-part row counts and SHA-256 checksums. All off by default: one plain <table>.csv.
+CSV_COMPRESSION = None  # None, "gzip" or "zstd" (needs the zstandard package)
+SPLIT_ROWS = None  # Start a new part after this many rows
+SPLIT_MB = None  # Start a new part after this many uncompressed megabytes
+WRITE_QUEUE_BATCHES = 4  # Batches buffered between the fetch loop and the writer thread
+
+# Streaming export settings: rows are read with fetchmany() and appended to the CSV
+# batch by batch, so worker memory is bounded by FETCH_BATCH_SIZE instead of table size
+STREAMING = True
+FETCH_BATCH_SIZE = 10000  # Rows per fetchmany() call and per CSV write
+PREFETCH_ROWS = FETCH_BATCH_SIZE + 1  # Fill the first batch in the execute() round trip
+
+# Intra-table parallelism: tables listed here are split into ranges that run as separate tasks.
+# "rowid" groups the table's extents into ROWID ranges (DBMS_PARALLEL_EXECUTE-style chunking);
+# "pk" splits a numeric single-column primary key (or the given "key") into equal-count ranges.
+SPLIT_TABLES = {
+    "ORDERS": {"method": "rowid", "chunks": 8},
+}
+MERGE_SHARDS = True  # Concatenate shards into one CSV in part order; False keeps the part files
+
+# Incremental export: tables listed here only export rows past the high-water mark stored in
+# STATE_FILE, into a new "<table>.delta_<run>" partition file. "column" is a timestamp or an
+# increasing key, or ORA_ROWSCN (create the table with ROWDEPENDENCIES for row-level SCNs).
+# A timestamp or key is set before its transaction commits, so a row committed after the mark
+# was read can carry a value below it. "lookback" re-reads that far behind the stored mark
+# (seconds for DATE/TIMESTAMP marks, units of the column for keys); the overlap rows appear
+# again in the next delta, so load deltas by key. ORA_ROWSCN is the commit SCN and needs none;
+# its mark is the exact current SCN, which needs EXECUTE on DBMS_FLASHBACK or SELECT on v$database.
+INCREMENTAL_TABLES = {}  # e.g. {"ORDERS": {"column": "LAST_UPDATED", "lookback": 600}}
+STATE_FILE = os.path.join(output_dir, "export_state.json")
+
+# Column metadata of the exported tables, refreshed only for tables whose DDL changed
+METADATA_CACHE_FILE = os.path.join(output_dir, "metadata_cache.json")
+
+# Per-task and per-table throughput of the last run
+SUMMARY_FILE = os.path.join(output_dir, "export_summary.json")
+
+# Optimizer row counts and allocated segment bytes, used to dispatch the largest tables first
+TABLE_SIZES_SQL = """
+    SELECT t.table_name, NVL(t.num_rows, 0), NVL(s.bytes, 0)
+    FROM user_tables t
+    LEFT JOIN (
+        SELECT segment_name, SUM(bytes) AS bytes FROM user_segments
+        WHERE segment_type LIKE 'TABLE%' GROUP BY segment_name
+    ) s ON s.segment_name = t.table_name
+"""
+
+# Group the table's extents into :chunks buckets of roughly equal block counts and turn the
+# first/last block of each bucket into a ROWID range. Works for non-partitioned heap tables.
+ROWID_RANGES_SQL = """
+    SELECT DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, r.lo_fno, r.lo_block, 0),
+           DBMS_ROWID.ROWID_CREATE(1, o.data_object_id, r.hi_fno, r.hi_block, 32767)
+    FROM (
+        SELECT DISTINCT grp,
+               FIRST_VALUE(relative_fno) OVER (PARTITION BY grp ORDER BY relative_fno, block_id
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS lo_fno,
+               FIRST_VALUE(block_id) OVER (PARTITION BY grp ORDER BY relative_fno, block_id
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS lo_block,
+               LAST_VALUE(relative_fno) OVER (PARTITION BY grp ORDER BY relative_fno, block_id
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS hi_fno,
+               LAST_VALUE(block_id + blocks - 1) OVER (PARTITION BY grp ORDER BY relative_fno, block_id
+                   ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING) AS hi_block
+        FROM (
+            SELECT relative_fno, block_id, blocks,
+                   TRUNC((SUM(blocks) OVER (ORDER BY relative_fno, block_id) - 0.01)
+                         / (SUM(blocks) OVER () / :chunks)) AS grp
+            FROM user_extents
+            WHERE segment_name = :table_name AND segment_type = 'TABLE'
+        )
+    ) r
+    CROSS JOIN (
+        SELECT data_object_id FROM user_objects
+        WHERE object_name = :table_name AND object_type = 'TABLE'
+    ) o
+    ORDER BY r.grp
+"""
+
+# Worker model: "process" runs one single-session worker process per core; "thread" runs a
+# thread pool sharing one session pool (cx_Oracle releases the GIL during network I/O)
+WORKER_MODE = "process"
+MAX_WORKERS = None  # None derives the count from cores, the task count and the DB session limit
+THREADS_PER_CORE = 4  # Export threads mostly wait on the database
+SESSION_HEADROOM = 5  # Sessions left free for other clients when sizing against DB limits
+
+# Session pool of the current process, created by init_worker() (never inherited across fork)
+pool = None
+# {table: [(column_name, data_type, data_precision, data_scale), ...]} handed to every worker
+table_metadata = {}
+
+SESSIONS_PER_USER_SQL = "SELECT limit FROM user_resource_limits WHERE resource_name = 'SESSIONS_PER_USER'"
+FREE_INSTANCE_SESSIONS_SQL = (
+    "SELECT TO_NUMBER(p.value) - (SELECT COUNT(*) FROM v$session) FROM v$parameter p WHERE p.name = 'sessions'"
+)
+
+def init_worker(sessions=1, metadata=None):
+    """Create this process's own session pool; used as the multiprocessing initializer."""
+    global pool, table_metadata
+    if metadata is not None:
+        table_metadata = metadata
+    pool = cx_Oracle.SessionPool(min=sessions, max=sessions, increment=1, threaded=sessions > 1,
+                                 getmode=cx_Oracle.SPOOL_ATTRVAL_WAIT, **DB_CONFIG)
+
+def get_session_limit():
+    """Number of sessions this export may open per the user's profile and the instance, or None."""
+    limits = []
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    try:
+        for sql in (SESSIONS_PER_USER_SQL, FREE_INSTANCE_SESSIONS_SQL):
+            try:
+                cursor.execute(sql)
+                row = cursor.fetchone()
+            except cx_Oracle.DatabaseError:
+                continue  # No access to the view; the other limit may still apply
+            # SESSIONS_PER_USER may be UNLIMITED or DEFAULT
+            if row and row[0] is not None and str(row[0]).isdigit():
+                limits.append(int(row[0]))
+    finally:
+        cursor.close()
+        pool.release(connection)
+    return max(1, min(limits) - SESSION_HEADROOM) if limits else None
+
+def size_workers(task_count, session_limit):
+    """Pick the worker count; every worker holds exactly one session."""
+    if MAX_WORKERS:
+        workers = MAX_WORKERS
+    elif WORKER_MODE == "thread":
+        workers = multiprocessing.cpu_count() * THREADS_PER_CORE
+    else:
+        workers = multiprocessing.cpu_count()
+    workers = min(workers, task_count)
+    if session_limit is not None:
+        workers = min(workers, session_limit)
+    return max(1, workers)
+
+def csv_text(rows):
+    """Rows formatted with csv.writer, values as fetched (no per-batch dtype inference)."""
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerows(rows)
+    return buffer.getvalue()
+
+def write_csv_in_batches(cursor, columns, csv_filename):
+    """Stream the open result set to a CSV file one fetchmany() batch at a time."""
+    rows_written = 0
+    csv_file = None
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            if csv_file is None:
+                # Open lazily so empty tables do not leave a header-only file behind
+                csv_file = open(csv_filename, "w", newline="", encoding="utf-8")
+                writer = csv.writer(csv_file, lineterminator="\n")
+                writer.writerow(columns)
+            writer.writerows(rows)
+            rows_written += len(rows)
+    except BaseException:
+        if csv_file is not None:
+            csv_file.close()
+            os.remove(csv_filename)  # Do not leave a truncated file behind
+        raise
+    if csv_file is not None:
+        csv_file.close()
+    return rows_written
+
+class HashingFile:
+    """Binary file wrapper that counts and SHA-256 hashes everything written to disk."""
+
+    def __init__(self, filename):
+        self.file = open(filename, "wb")
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+class CsvPartWriter:
+    """Write CSV batches to compressed and/or size-limited part files on a background thread.
+
+    Every part starts with the header so it can be loaded on its own, and close() writes
+    <base>.manifest.json listing the parts with their row counts, sizes and checksums. The
+    manifest only exists for complete exports: after a failure the parts are deleted.
+    """
+
+    def __init__(self, base, columns):
+        self.base = base
+        self.columns = columns
+        self.header = csv_text([columns]).encode("utf-8")
+        self.extension = {"gzip": ".csv.gz", "zstd": ".csv.zst"}.get(CSV_COMPRESSION, ".csv")
+        self.split = bool(SPLIT_ROWS or SPLIT_MB)
+        self.parts = []
+        self.filenames = []
+        self.rows_written = 0
+        self.error = None
+
+        # Remove parts of a previous run so a shorter export leaves no stale files behind
+        for stale in glob.glob(f"{glob.escape(base)}.[0-9][0-9][0-9][0-9][0-9]{self.extension}"):
+            os.remove(stale)
+        if os.path.exists(self.manifest_filename()):
+            os.remove(self.manifest_filename())
+
+        self.queue = queue.Queue(maxsize=WRITE_QUEUE_BATCHES)
+        self.thread = threading.Thread(target=self._write_parts, daemon=True)
+        self.thread.start()
+
+    def manifest_filename(self):
+        return f"{self.base}.manifest.json"
+
+    def write_batch(self, rows):
+        """Serialize a fetched batch and hand it to the writer thread."""
+        if self.error:
+            raise self.error
+        self.queue.put((csv_text(rows).encode("utf-8"), len(rows)))
+
+    def close(self, complete=True):
+        """Flush the remaining batches, write the manifest and return the rows written.
+
+        With complete=False (the fetch loop failed) or after a write error the parts are
+        removed instead, so an interrupted export never looks finished.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.error or not complete:
+            self._discard()
+            if complete:
+                raise self.error
+            return 0
+        if self.rows_written:
+            manifest = {
+                "columns": self.columns,
+                "compression": CSV_COMPRESSION,
+                "rows": self.rows_written,
+                "parts": self.parts,
+            }
+            with open(self.manifest_filename(), "w") as manifest_file:
+                json.dump(manifest, manifest_file, indent=2)
+        return self.rows_written
+
+    def _discard(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.remove(filename)
+        self.parts = []
+
+    def _open_part(self):
+        if self.split:
+            filename = f"{self.base}.{len(self.parts) + 1:05d}{self.extension}"
+        else:
+            filename = f"{self.base}{self.extension}"
+        self.filenames.append(filename)
+        sink = HashingFile(filename)
+        if CSV_COMPRESSION == "gzip":
+            stream = gzip.GzipFile(filename=os.path.basename(filename), mode="wb", fileobj=sink)
+        elif CSV_COMPRESSION == "zstd":
+            import zstandard
+            stream = zstandard.ZstdCompressor().stream_writer(sink, closefd=False)
+        else:
+            stream = sink
+        stream.write(self.header)
+        return {"filename": filename, "sink": sink, "stream": stream, "rows": 0, "raw_bytes": 0}
+
+    def _close_part(self, part):
+        if part["stream"] is not part["sink"]:
+            part["stream"].close()
+        part["sink"].close()
+        self.parts.append({
+            "file": os.path.basename(part["filename"]),
+            "rows": part["rows"],
+            "bytes": part["sink"].size,
+            "sha256": part["sink"].sha256.hexdigest(),
+        })
+
+    def _is_full(self, part, rows, raw_bytes):
+        if not self.split or not part["rows"]:
+            return False
+        if SPLIT_ROWS and part["rows"] + rows > SPLIT_ROWS:
+            return True
+        return bool(SPLIT_MB) and part["raw_bytes"] + raw_bytes > SPLIT_MB * 1024 * 1024
+
+    def _write_parts(self):
+        part = None
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            if self.error:
+                continue  # Keep draining so the fetch loop never blocks on a dead writer
+            data, rows = item
+            try:
+                if part is not None and self._is_full(part, rows, len(data)):
+                    self._close_part(part)
+                    part = None
+                if part is None:
+                    part = self._open_part()
+                part["stream"].write(data)
+                part["rows"] += rows
+                part["raw_bytes"] += len(data)
+                self.rows_written += rows
+            except (IOError, OSError) as e:
+                self.error = e
+        if part is not None:
+            try:
+                self._close_part(part)
+            except (IOError, OSError) as e:
+                self.error = self.error or e
+
+def write_csv_parts(cursor, columns, base):
+    """Stream the open result set through a CsvPartWriter one fetchmany() batch at a time."""
+    writer = CsvPartWriter(base, columns)
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            writer.write_batch(rows)
+    except BaseException:
+        writer.close(complete=False)
+        raise
+    return writer.close()
+
+def csv_parts_enabled():
+    """Whether CSV output goes through CsvPartWriter instead of a single plain file."""
+    return bool(CSV_COMPRESSION or SPLIT_ROWS or SPLIT_MB)
+
+def oracle_to_arrow_type(data_type, precision, scale):
+    """Map a column type to the Arrow type its values are fetched as (see fetch_arrow_values).
+
+    Accepts user_tab_columns precision/scale as well as cursor.description's, where an
+    unconstrained NUMBER has scale -127 and INTEGER has precision 38.
+    """
+    if data_type == "NUMBER":
+        if scale is None or scale == -127:
+            return pa.float64()  # Unconstrained NUMBER or FLOAT, fetched as float
+        precision = precision or 38  # INTEGER and NUMBER(*,s)
+        if scale == 0 and precision <= 18:
+            return pa.int64()
+        if scale < 0:
+            return pa.decimal128(min(38, precision - scale), 0)
+        return pa.decimal128(precision, scale)
+    if data_type in ("FLOAT", "BINARY_FLOAT", "BINARY_DOUBLE"):
+        return pa.float64()
+    if data_type in ("VARCHAR2", "NVARCHAR2", "CHAR", "NCHAR", "CLOB", "NCLOB", "LONG", "ROWID", "UROWID"):
+        return pa.string()
+    if data_type in ("RAW", "LONG RAW", "BLOB"):
+        return pa.binary()
+    if data_type == "DATE":
+        return pa.timestamp("s")
+    if data_type.startswith("TIMESTAMP"):
+        return pa.timestamp("us")
+    if data_type.startswith("INTERVAL DAY"):
+        return pa.duration("us")
+    return pa.string()
+
+def fetch_arrow_values(cursor, name, default_type, size, precision, scale):
+    """Output type handler returning values that convert to oracle_to_arrow_type() losslessly.
+
+    LOB columns come back as str/bytes instead of LOB locators, and NUMBERs that do not fit
+    int64 as decimal.Decimal (unconstrained NUMBER and FLOAT as float).
+    """
+    if default_type == cx_Oracle.DB_TYPE_NUMBER:
+        if scale == -127:
+            return cursor.var(float, arraysize=cursor.arraysize)
+        if scale != 0 or not 0 < precision <= 18:
+            return cursor.var(decimal.Decimal, arraysize=cursor.arraysize)
+        return None
+    if default_type in (cx_Oracle.DB_TYPE_CLOB, cx_Oracle.DB_TYPE_NCLOB):
+        return cursor.var(cx_Oracle.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if default_type == cx_Oracle.DB_TYPE_BLOB:
+        return cursor.var(cx_Oracle.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+
+def write_parquet_in_batches(cursor, schema, parquet_filename):
+    """Stream the open result set to a Parquet file, one row group per fetchmany() batch."""
+    rows_written = 0
+    writer = None
+    try:
+        while True:
+            rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+            if not rows:
+                break
+            if writer is None:
+                writer = pq.ParquetWriter(parquet_filename, schema, compression=PARQUET_COMPRESSION)
+            arrays = [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)]
+            batch = pa.Table.from_arrays(arrays, schema=schema)
+            writer.write_table(batch, row_group_size=len(rows))
+            rows_written += len(rows)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+            os.remove(parquet_filename)  # Do not leave a truncated file behind
+        raise
+    if writer is not None:
+        writer.close()
+    return rows_written
+
+def load_table_metadata(tables):
+    """Load column metadata for all tables in bulk, reusing METADATA_CACHE_FILE entries.
+
+    Entries are keyed by table and its user_objects.last_ddl_time, so only tables altered since
+    the last run are read from user_tab_columns. Names that are not tables of this schema (views,
+    synonyms, SCHEMA.TABLE) are left out; their exports take types from cursor.description.
+    """
+    cache = {}
+    if os.path.exists(METADATA_CACHE_FILE):
+        with open(METADATA_CACHE_FILE, "r") as cache_file:
+            cache = json.load(cache_file)
+
+    wanted = set(tables)
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT object_name, last_ddl_time FROM user_objects WHERE object_type = 'TABLE'")
+        ddl_times = {table: ddl_time.isoformat() for table, ddl_time in cursor if table in wanted}
+
+        stale = sorted(table for table, ddl_time in ddl_times.items()
+                       if cache.get(table, {}).get("last_ddl_time") != ddl_time)
+        for table in stale:
+            cache[table] = {"last_ddl_time": ddl_times[table], "columns": []}
+        # Read only the altered tables, in chunks of at most 1000 names (Oracle's IN list limit)
+        for start in range(0, len(stale), 1000):
+            chunk = stale[start:start + 1000]
+            placeholders = ", ".join(f":{position}" for position in range(1, len(chunk) + 1))
+            cursor.execute(
+                "SELECT table_name, column_name, data_type, data_precision, data_scale "
+                f"FROM user_tab_columns WHERE table_name IN ({placeholders}) ORDER BY table_name, column_id",
+                chunk,
+            )
+            for table, *column in cursor:
+                cache[table]["columns"].append(column)
+        if stale:
+            with open(METADATA_CACHE_FILE, "w") as cache_file:
+                json.dump(cache, cache_file, indent=2)
+    finally:
+        cursor.close()
+        pool.release(connection)
+
+    print(f"🗂️ Column metadata for {len(ddl_times)} tables ({len(stale)} refreshed)")
+    return {table: [tuple(column) for column in cache[table]["columns"]] for table in ddl_times}
+
+def column_info_from_description(description):
+    """(name, type, precision, scale) per result column, for tables missing from the cache."""
+    return [(column[0], column[1].name.replace("DB_TYPE_", ""), column[4], column[5])
+            for column in description]
+
+def output_base(name, part=None):
+    """Output path of a table, or of one range of a split table, without the extension."""
+    if part is None:
+        return os.path.join(output_dir, name)
+    return os.path.join(output_dir, f"{name}.part{part:04d}")
+
+def output_filename(name, part=None, output_format=OUTPUT_FORMAT):
+    """Path of an output file, or of one range of a split table."""
+    return f"{output_base(name, part)}.{output_format}"
+
+def output_size(name, part=None):
+    """Bytes written for an output, summed over its parts when a manifest exists."""
+    manifest_filename = f"{output_base(name, part)}.manifest.json"
+    if os.path.exists(manifest_filename):
+        with open(manifest_filename, "r") as manifest_file:
+            return sum(entry["bytes"] for entry in json.load(manifest_file)["parts"])
+    filename = output_filename(name, part)
+    return os.path.getsize(filename) if os.path.exists(filename) else 0
+
+def fetch_and_write_table(table, streaming=STREAMING, part=None, where=None, binds=None,
+                          output_format=OUTPUT_FORMAT, name=None):
+    """Fetch data from a table (or one range of it) and write it to a CSV or Parquet file.
+
+    Returns the number of rows written, or None if the export failed.
+    """
+    connection = cursor = None
+    label = table if part is None else f"{table} part {part}"
     try:
         # Get a connection from the pool
         connection = pool.acquire()
         cursor = connection.cursor()
 
-        print(f"🔄 Processing table: {table}")
+        print(f"🔄 Processing table: {label}")
+
+        query = f"SELECT * FROM {table}"
+        if where:
+            query += f" WHERE {where}"
+
+        filename = output_filename(name or table, part, output_format)
+
+        # Parquet and CSV part files are always written batch by batch
+        if streaming or output_format == "parquet" or csv_parts_enabled():
+            # Tune the network round trips to match the batch size
+            cursor.arraysize = FETCH_BATCH_SIZE
+            cursor.prefetchrows = PREFETCH_ROWS
+
+            if output_format == "parquet":
+                cursor.outputtypehandler = fetch_arrow_values
+            cursor.execute(query, binds or {})
+            # Column names come from the result set itself, so they always match SELECT * order
+            columns = [column[0] for column in cursor.description]
+
+            if output_format == "parquet":
+                column_info = table_metadata.get(table)
+                if not column_info or [column[0] for column in column_info] != columns:
+                    column_info = column_info_from_description(cursor.description)
+                schema = pa.schema([pa.field(column, oracle_to_arrow_type(data_type, precision, scale))
+                                    for column, data_type, precision, scale in column_info])
+                rows_written = write_parquet_in_batches(cursor, schema, filename)
+            elif csv_parts_enabled():
+                filename = output_base(name or table, part)
+                rows_written = write_csv_parts(cursor, columns, filename)
+            else:
+                rows_written = write_csv_in_batches(cursor, columns, filename)
+
+            if not rows_written:
+                print(f"⚠️ No data found in {label}. Skipping.")
+                return 0
 
-        # Fetch column names and data types
-        cursor.execute(f"SELECT column_name FROM user_tab_columns WHERE table_name = '{table}'")
-        columns = [col[0] for col in cursor.fetchall()]
+            print(f"✅ {rows_written} rows from {label} streamed to {filename}")
+            return rows_written
 
         # Fetch table data efficiently
-        cursor.execute(f"SELECT * FROM {table}")
+        cursor.execute(query, binds or {})
+        columns = [column[0] for column in cursor.description]
         rows = cursor.fetchall()
 
         if not rows:
-            print(f"⚠️ No data found in {table}. Skipping.")
-            return
+            print(f"⚠️ No data found in {label}. Skipping.")
+            return 0
         
         # Convert data to DataFrame
         df = pd.DataFrame(rows, columns=columns)
 
         # Write data to CSV using pandas (faster than csv.writer)
-        csv_filename = os.path.join(output_dir, f"{table}.csv")
-        df.to_csv(csv_filename, index=False, encoding="utf-8")
+        df.to_csv(filename, index=False, encoding="utf-8")
 
-        print(f"✅ Data from {table} written to {csv_filename}")
+        print(f"✅ Data from {label} written to {filename}")
+        return len(rows)
 
-    except cx_Oracle.DatabaseError as e:
-        print(f"❌ Error processing table {table}: {e}")
+    except (cx_Oracle.DatabaseError, pa.ArrowException, OverflowError, ValueError, OSError) as e:
+        # Conversion and file errors fail this task only, not the whole export
+        print(f"❌ Error processing table {label}: {e}")
+        return None
+
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection is not None:
+            pool.release(connection)  # Return connection to the pool
+
+def get_primary_key_column(cursor, table):
+    """Return the single primary key column of a table."""
+    cursor.execute(
+        "SELECT cc.column_name FROM user_constraints c "
+        "JOIN user_cons_columns cc ON cc.constraint_name = c.constraint_name "
+        "WHERE c.table_name = :table_name AND c.constraint_type = 'P'",
+        table_name=table,
+    )
+    key_columns = [row[0] for row in cursor.fetchall()]
+    if len(key_columns) != 1:
+        raise ValueError(f"{table} needs a single-column primary key for pk splitting, found {key_columns}")
+    return key_columns[0]
+
+def plan_table_ranges(table, method="rowid", chunks=8, key=None):
+    """Split a table into ordered (where_clause, binds) ranges, one per export task."""
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    try:
+        if method == "rowid":
+            cursor.execute(ROWID_RANGES_SQL, chunks=chunks, table_name=table)
+            return [("ROWID BETWEEN :lo AND :hi", {"lo": lo, "hi": hi}) for lo, hi in cursor.fetchall()]
+
+        if method == "pk":
+            key = key or get_primary_key_column(cursor, table)
+            # NTILE gives equal row counts per bucket. The ranges run from one bucket's lowest key
+            # up to (not including) the next one's, so a non-unique key value that spans two
+            # buckets is exported once; the first range also takes the NULL keys.
+            cursor.execute(
+                f"SELECT MIN({key}) FROM "
+                f"(SELECT {key}, NTILE(:chunks) OVER (ORDER BY {key}) AS bucket FROM {table} "
+                f"WHERE {key} IS NOT NULL) GROUP BY bucket ORDER BY bucket",
+                chunks=chunks,
+            )
+            bounds = []
+            for (lo,) in cursor:
+                if not bounds or lo != bounds[-1]:
+                    bounds.append(lo)
+            if len(bounds) < 2:
+                return []
+            ranges = [(f"{key} < :hi OR {key} IS NULL", {"hi": bounds[1]})]
+            for lo, hi in zip(bounds[1:-1], bounds[2:]):
+                ranges.append((f"{key} >= :lo AND {key} < :hi", {"lo": lo, "hi": hi}))
+            ranges.append((f"{key} >= :lo", {"lo": bounds[-1]}))
+            return ranges
+
+        raise ValueError(f"Unknown split method '{method}' for {table}")
+    finally:
+        cursor.close()
+        pool.release(connection)
+
+def load_state():
+    """Load the per-table high-water marks of previous incremental runs."""
+    if not os.path.exists(STATE_FILE):
+        return {}
+    with open(STATE_FILE, "r") as state_file:
+        return json.load(state_file)
+
+def save_state(state):
+    """Atomically replace the high-water mark file."""
+    tmp_filename = f"{STATE_FILE}.tmp"
+    with open(tmp_filename, "w") as state_file:
+        json.dump(state, state_file, indent=2)
+    os.replace(tmp_filename, STATE_FILE)
+
+def encode_mark(column, value):
+    """JSON-serializable state entry for a high-water mark."""
+    if isinstance(value, datetime):
+        return {"column": column, "type": "datetime", "value": value.isoformat()}
+    return {"column": column, "type": "value", "value": value}
+
+def decode_mark(entry):
+    """Bind value of a stored high-water mark."""
+    if entry["type"] == "datetime":
+        return datetime.fromisoformat(entry["value"])
+    return entry["value"]
+
+def current_scn(cursor):
+    """The database's exact current SCN (TIMESTAMP_TO_SCN is only accurate to a few seconds)."""
+    try:
+        cursor.execute("SELECT DBMS_FLASHBACK.GET_SYSTEM_CHANGE_NUMBER FROM dual")
+    except cx_Oracle.DatabaseError:
+        try:
+            cursor.execute("SELECT current_scn FROM v$database")
+        except cx_Oracle.DatabaseError as e:
+            raise cx_Oracle.DatabaseError(
+                f"ORA_ROWSCN marks need EXECUTE on DBMS_FLASHBACK or SELECT on v$database: {e}") from e
+    return cursor.fetchone()[0]
+
+def plan_incremental(table, column, state, lookback=0):
+    """Return (where, binds, new_mark) covering rows past the stored mark, or None if nothing changed.
+
+    The new mark is the column's maximum when the run starts. Rows of transactions still open at
+    that point may commit later with a lower value; only the lookback window (subtracted from the
+    stored mark) brings them into the next delta, at the cost of re-exporting the overlap.
+    """
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    try:
+        if column.upper() == "ORA_ROWSCN":
+            new_value = current_scn(cursor)
+        else:
+            cursor.execute(f"SELECT MAX({column}) FROM {table}")
+            new_value = cursor.fetchone()[0]
+    finally:
+        cursor.close()
+        pool.release(connection)
+
+    if new_value is None:
+        return None
 
+    previous = state.get(table)
+    if previous and previous["column"] == column:
+        last_value = decode_mark(previous)
+        if new_value == last_value and not lookback:
+            return None
+        if lookback:
+            last_value -= timedelta(seconds=lookback) if isinstance(last_value, datetime) else lookback
+        where = f"{column} > :hwm_lo AND {column} <= :hwm_hi"
+        binds = {"hwm_lo": last_value, "hwm_hi": new_value}
+    else:
+        # First run (or a changed mark column): export everything up to the new mark
+        where = f"{column} <= :hwm_hi"
+        binds = {"hwm_hi": new_value}
+    return where, binds, encode_mark(column, new_value)
+
+def build_export_tasks(tables, state, run_id):
+    """Expand the table list into (table, name, part, where, binds) tasks.
+
+    Tables in SPLIT_TABLES become one task per range and tables in INCREMENTAL_TABLES are
+    restricted to their delta. Returns the tasks and the high-water marks to store on success.
+    """
+    tasks = []
+    new_marks = {}
+    for table in tables:
+        name = table
+        delta_where, delta_binds = None, {}
+        if table in INCREMENTAL_TABLES:
+            try:
+                delta = plan_incremental(table, INCREMENTAL_TABLES[table]["column"], state,
+                                         INCREMENTAL_TABLES[table].get("lookback", 0))
+            except cx_Oracle.DatabaseError as e:
+                print(f"❌ Could not read the high-water mark of {table}, skipping it: {e}")
+                continue
+            if delta is None:
+                print(f"⏭️ No changes in {table} since the last run. Skipping.")
+                continue
+            delta_where, delta_binds, new_marks[table] = delta
+            name = f"{table}.delta_{run_id}"
+
+        ranges = []
+        if table in SPLIT_TABLES:
+            try:
+                ranges = plan_table_ranges(table, **SPLIT_TABLES[table])
+            except (cx_Oracle.DatabaseError, ValueError) as e:
+                print(f"⚠️ Could not split {table}, exporting it as a single task: {e}")
+
+        if len(ranges) > 1:
+            print(f"🔀 Split {table} into {len(ranges)} ranges")
+            for part, (where, binds) in enumerate(ranges):
+                if delta_where:
+                    where = f"({where}) AND ({delta_where})"
+                tasks.append((table, name, part, where, {**binds, **delta_binds}))
+        else:
+            tasks.append((table, name, None, delta_where, delta_binds or None))
+    return tasks, new_marks
+
+def estimate_table_sizes(tables):
+    """Estimated (num_rows, bytes) of each table from user_tables/user_segments."""
+    wanted = set(tables)
+    connection = pool.acquire()
+    cursor = connection.cursor()
+    try:
+        cursor.execute(TABLE_SIZES_SQL)
+        return {table: (num_rows, size) for table, num_rows, size in cursor if table in wanted}
+    except cx_Oracle.DatabaseError as e:
+        print(f"⚠️ Could not estimate table sizes, keeping list order: {e}")
+        return {}
     finally:
         cursor.close()
-        pool.release(connection)  # Return connection to the pool
+        pool.release(connection)
+
+def estimate_task_bytes(tasks, table_sizes):
+    """Spread each table's estimated bytes evenly over its range tasks."""
+    part_counts = Counter(name for _, name, _, _, _ in tasks)
+    return [table_sizes.get(table, (0, 0))[1] / part_counts[name] for table, name, _, _, _ in tasks]
+
+def run_export_task(indexed_task):
+    """Pool entry point: export one table or one range of a split table.
+
+    Returns (index, rows, seconds, output_bytes); rows is None if the export failed.
+    """
+    index, (table, name, part, where, binds) = indexed_task
+    start_time = time.perf_counter()
+    rows = fetch_and_write_table(table, part=part, where=where, binds=binds, name=name)
+    seconds = time.perf_counter() - start_time
+    output_bytes = output_size(name, part) if rows else 0
+    return index, rows, seconds, output_bytes
+
+def format_eta(elapsed, done, total):
+    """Remaining time extrapolated from the share of estimated work completed so far."""
+    if not done or done >= total:
+        return "0s" if done >= total else "unknown"
+    return f"{elapsed * (total - done) / done:.0f}s"
+
+def write_summary(tasks, task_stats, wall_seconds):
+    """Write per-task and per-table rows/sec and MB/sec to SUMMARY_FILE."""
+    tables = {}
+    for (table, name, part, _, _), (rows, seconds, output_bytes) in zip(tasks, task_stats):
+        entry = tables.setdefault(table, {"rows": 0, "seconds": 0.0, "bytes": 0, "tasks": 0, "failed": 0})
+        entry["rows"] += rows or 0
+        entry["seconds"] += seconds
+        entry["bytes"] += output_bytes
+        entry["tasks"] += 1
+        entry["failed"] += rows is None
+    for entry in tables.values():
+        busy = entry["seconds"] or 1e-9
+        entry["rows_per_sec"] = round(entry["rows"] / busy, 1)
+        entry["mb_per_sec"] = round(entry["bytes"] / busy / 1e6, 3)
+        entry["seconds"] = round(entry["seconds"], 3)
+
+    summary = {
+        "wall_seconds": round(wall_seconds, 3),
+        "worker_mode": WORKER_MODE,
+        "tables": dict(sorted(tables.items(), key=lambda item: item[1]["seconds"], reverse=True)),
+        "tasks": [
+            {"table": table, "output": name, "part": part, "rows": rows,
+             "seconds": round(seconds, 3), "bytes": output_bytes}
+            for (table, name, part, _, _), (rows, seconds, output_bytes) in zip(tasks, task_stats)
+        ],
+    }
+    with open(SUMMARY_FILE, "w") as summary_file:
+        json.dump(summary, summary_file, indent=2)
+    print(f"📈 Export summary written to {SUMMARY_FILE}")
+
+def merge_csv_shards(name, part_count):
+    """Concatenate a split table's CSV part files, in part order, into a single CSV."""
+    csv_filename = output_filename(name, output_format="csv")
+    header_written = False
+    with open(csv_filename, "wb") as merged:
+        for part in range(part_count):
+            shard = output_filename(name, part, "csv")
+            if not os.path.exists(shard):
+                continue  # Empty ranges do not produce a file
+            with open(shard, "rb") as shard_file:
+                header = shard_file.readline()
+                if not header_written:
+                    merged.write(header)
+                    header_written = True
+                shutil.copyfileobj(shard_file, merged)
+            os.remove(shard)
+
+    if not header_written:
+        os.remove(csv_filename)
+        print(f"⚠️ No data found in {name}. Skipping.")
+    else:
+        print(f"🧩 Merged {part_count} parts of {name} into {csv_filename}")
+
+def merge_parquet_shards(name, part_count):
+    """Copy the row groups of a split table's Parquet part files, in part order, into one file."""
+    parquet_filename = output_filename(name, output_format="parquet")
+    writer = None
+    try:
+        for part in range(part_count):
+            shard = output_filename(name, part, "parquet")
+            if not os.path.exists(shard):
+                continue  # Empty ranges do not produce a file
+            with open(shard, "rb") as shard_file:
+                parquet_file = pq.ParquetFile(shard_file)
+                if writer is None:
+                    writer = pq.ParquetWriter(parquet_filename, parquet_file.schema_arrow,
+                                              compression=PARQUET_COMPRESSION)
+                for row_group in range(parquet_file.num_row_groups):
+                    writer.write_table(parquet_file.read_row_group(row_group))
+            os.remove(shard)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        print(f"⚠️ No data found in {name}. Skipping.")
+    else:
+        print(f"🧩 Merged {part_count} parts of {name} into {parquet_filename}")
+
+def merge_manifests(name, part_count):
+    """Combine the manifests of a split table's ranges, in part order, into one manifest.
+
+    Compressed or size-limited part files are already loadable on their own, so they are kept
+    as they are and only listed in the table's manifest.
+    """
+    manifest = None
+    for part in range(part_count):
+        part_manifest_filename = f"{output_base(name, part)}.manifest.json"
+        if not os.path.exists(part_manifest_filename):
+            continue  # Empty ranges do not produce a manifest
+        with open(part_manifest_filename, "r") as part_manifest_file:
+            part_manifest = json.load(part_manifest_file)
+        if manifest is None:
+            manifest = {**part_manifest, "rows": 0, "parts": []}
+        manifest["rows"] += part_manifest["rows"]
+        manifest["parts"].extend(part_manifest["parts"])
+        os.remove(part_manifest_filename)
+
+    if manifest is None:
+        print(f"⚠️ No data found in {name}. Skipping.")
+        return
+    manifest_filename = f"{output_base(name)}.manifest.json"
+    with open(manifest_filename, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    print(f"🧩 Listed {len(manifest['parts'])} files of {name} in {manifest_filename}")
+
+def merge_shards(name, part_count, output_format=OUTPUT_FORMAT):
+    """Merge a split table's part files into a single output file."""
+    if output_format == "parquet":
+        merge_parquet_shards(name, part_count)
+    elif csv_parts_enabled():
+        merge_manifests(name, part_count)
+    else:
+        merge_csv_shards(name, part_count)
 
 if __name__ == "__main__":
-    # Use multiprocessing with dynamic number of workers
-    num_workers = min(multiprocessing.cpu_count(), len(custom_tables))  
-    with multiprocessing.Pool(processes=num_workers) as pool:
-        pool.map(fetch_and_write_table, custom_tables)
+    # Plan on a single session, then close it so no connection crosses into the workers
+    init_worker(1)
+    # Split large tables into ranges so one big table can use every worker, and restrict
+    # incremental tables to the rows changed since the last run
+    state = load_state()
+    run_id = datetime.now().strftime("%Y%m%dT%H%M%S")
+    metadata = load_table_metadata(custom_tables)
+    for table in custom_tables:
+        if table not in metadata:
+            print(f"ℹ️ {table} is not a table of this schema; column types will come from the result set")
+    tables = custom_tables
+    tasks, new_marks = build_export_tasks(tables, state, run_id)
+    num_workers = size_workers(len(tasks), get_session_limit())
+    task_bytes = estimate_task_bytes(tasks, estimate_table_sizes(tables))
+    pool.close()
+
+    # Dispatch the largest tasks first so a big table never starts at the end of the run
+    order = sorted(range(len(tasks)), key=lambda index: task_bytes[index], reverse=True)
+    if not any(task_bytes):
+        task_bytes = [1] * len(tasks)  # No size estimates: measure progress in tasks
+    total_bytes = sum(task_bytes)
+
+    print(f"🚀 Exporting {len(tasks)} tasks with {num_workers} {WORKER_MODE} workers")
+    if WORKER_MODE == "thread":
+        # One shared session pool with a session per thread
+        init_worker(num_workers, metadata)
+        workers = ThreadPool(processes=num_workers)
+    else:
+        # Each process builds its own single-session pool after it starts
+        workers = multiprocessing.Pool(processes=num_workers, initializer=init_worker,
+                                       initargs=(1, metadata))
+
+    results = [None] * len(tasks)
+    task_stats = [None] * len(tasks)
+    done_bytes = 0
+    start_time = time.perf_counter()
+    with workers:
+        indexed_tasks = ((index, tasks[index]) for index in order)
+        for completed, (index, rows, seconds, output_bytes) in enumerate(
+                workers.imap_unordered(run_export_task, indexed_tasks), start=1):
+            results[index] = rows
+            task_stats[index] = (rows, seconds, output_bytes)
+            done_bytes += task_bytes[index]
+            busy = seconds or 1e-9
+            table, name, part = tasks[index][:3]
+            label = table if part is None else f"{table} part {part}"
+            print(f"📊 [{completed}/{len(tasks)}] {label}: {rows or 0} rows in {seconds:.1f}s "
+                  f"({(rows or 0) / busy:.0f} rows/s, {output_bytes / busy / 1e6:.2f} MB/s), "
+                  f"ETA {format_eta(time.perf_counter() - start_time, done_bytes, total_bytes)}")
+    wall_seconds = time.perf_counter() - start_time
+
+    write_summary(tasks, task_stats, wall_seconds)
+
+    # Group results per output file to merge split tables and commit high-water marks
+    outputs = {}
+    for (table, name, part, _, _), rows in zip(tasks, results):
+        outputs.setdefault((table, name), []).append((part, rows))
+
+    for (table, name), part_results in outputs.items():
+        failed = any(rows is None for _, rows in part_results)
+        if MERGE_SHARDS and part_results[0][0] is not None:
+            if failed:
+                print(f"❌ Some parts of {table} failed; leaving part files in place.")
+            else:
+                merge_shards(name, len(part_results))
+        # A failed delta is exported again next run because its mark is not advanced
+        if table in new_marks and not failed:
+            state[table] = new_marks[table]
+
+    if new_marks:
+        save_state(state)
 
     print("🎉 All tables have been processed in parallel using connection pooling!")
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import call_metrics
+
+logger = logging.getLogger(__name__)
+
+# Persistent cache of vision API responses shared by the vision scripts. The key is a hash of
+# the whole request payload: the base64 images, system and user prompts, model name and
+# sampling parameters, so any change to one of them is a different entry.
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1") == "1"
+RESPONSE_CACHE_FILE = os.getenv("RESPONSE_CACHE_FILE", "vision_response_cache.db")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds
+RESPONSE_CACHE_MAX_MB = int(os.getenv("RESPONSE_CACHE_MAX_MB", "256"))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def cache_key(payload):
+    """SHA-256 of the payload as canonical JSON."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """SQLite-backed response store with TTL expiry and least-recently-used size eviction."""
+
+    def __init__(self, path=RESPONSE_CACHE_FILE, ttl=RESPONSE_CACHE_TTL, max_bytes=RESPONSE_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0  # Misses answered by an identical call already in flight
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> Future of the call answering it
+        self._in_flight_lock = threading.Lock()
+        # One connection shared by the worker threads; WAL lets several scripts use the file at once
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response FROM responses WHERE key = ? AND created_at > ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, response):
+        text = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)", (key, text, len(text), now, now)
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then the least recently used ones until under max_bytes."""
+        self._conn.execute("DELETE FROM responses WHERE created_at <= ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", stale)
+
+    def get_or_call(self, payload, call):
+        """Cached response for payload, or call() and store its result (failures are not cached).
+
+        Concurrent misses on the same payload make one call: the others wait for its result, and
+        only call() themselves if it fails.
+        """
+        with call_metrics.phase("cache_lookup"):
+            key = cache_key(payload)
+            response = self.get(key)
+        if response is not None:
+            call_metrics.annotate(cache_hit=True)
+            return response
+
+        with self._in_flight_lock:
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+        if not leader:
+            try:
+                with call_metrics.phase("cache_lookup"):
+                    response = future.result()
+            except Exception:
+                return call()
+            with self._lock:
+                self.shared += 1
+            call_metrics.annotate(cache_hit=True)
+            return response
+
+        try:
+            response = call()
+            with call_metrics.phase("cache_lookup"):
+                self.put(key, response)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(response)
+        finally:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+        return response
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+def get_response_cache():
+    """The process-wide cache, or None when RESPONSE_CACHE is off."""
+    global _cache
+    if not RESPONSE_CACHE_ENABLED:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache()
+    return _cache
+
+
+def cached_response(payload, call):
+    """Answer payload from the shared cache when enabled, otherwise just call()."""
+    cache = get_response_cache()
+    if cache is None:
+        return call()
+    return cache.get_or_call(payload, call)
@@ -1,4 +1,4 @@
-import requests
+from http_client import get_session
 import pandas as pd
 import pyarrow.parquet as pq
 import pyarrow as pa
@@ -14,7 +14,7 @@ PASSWORD = "your-salesforce-password"
 
 def get_salesforce_token():
     """Authenticate and retrieve Salesforce access token and instance URL."""
-    response = requests.post(
+    response = get_session().post(
         TOKEN_URL,
         data={
             "grant_type": "password",
@@ -30,7 +30,7 @@ def get_salesforce_token():
 
 def fetch_salesforce_accounts(token, instance_url):
     """Fetch Id and Name from the Account object in Salesforce."""
-    response = requests.get(
+    response = get_session().get(
         f"{instance_url}/services/data/v59.0/query",
         headers={"Authorization": f"Bearer {token}"},
         params={"q": "SELECT Id, Name FROM Account LIMIT 100"},
@@ -0,0 +1,77 @@
+import os
+import queue
+import re
+import sqlite3
+import time
+from contextlib import contextmanager
+
+# SQLite stand-in for MySQL behind app.get_db_connection, so the customers API can be
+# benchmarked without a database server. Statements are translated from the MySQL dialect
+# used by app.py; QUERY_LATENCY adds a per-statement delay to mimic a network round trip.
+DB_PATH = "benchmark_customers.db"
+QUERY_LATENCY = 0.0  # Seconds
+
+# Idle connections; streamed responses may resume on another thread, so connections are
+# borrowed per request instead of being tied to a thread
+_connections = queue.SimpleQueue()
+
+
+def translate(sql):
+    """Rewrite the MySQL statements issued by app.py into SQLite syntax."""
+    sql = sql.replace("%s", "?")
+    sql = re.sub(r"\s+FOR UPDATE\b", "", sql)
+    sql = sql.replace("INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+    sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT(id) DO UPDATE SET")
+    return re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+
+
+class StandinCursor:
+    """sqlite3 cursor that accepts app.py's MySQL statements."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def execute(self, sql, params=()):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        self._cursor.execute(translate(sql), tuple(params))
+
+    def executemany(self, sql, seq_params):
+        if QUERY_LATENCY:
+            time.sleep(QUERY_LATENCY)
+        self._cursor.executemany(translate(sql), [tuple(params) for params in seq_params])
+
+    def __getattr__(self, name):
+        # fetchone/fetchmany/fetchall, description, rowcount, lastrowid, close
+        return getattr(self._cursor, name)
+
+
+def reset():
+    """Start from an empty database file."""
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
+
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# Same (cursor, conn) interface as app.get_db_connection
+@contextmanager
+def get_db_connection():
+    try:
+        conn = _connections.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+    cursor = StandinCursor(conn.cursor())
+    try:
+        yield cursor, conn
+    finally:
+        cursor.close()
+        if conn.in_transaction:
+            conn.rollback()  # Never hand back a connection holding the write lock
+        _connections.put(conn)
@@ -0,0 +1,104 @@
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Local stand-in for the token and completions endpoints, for trying the streaming client
+# without the real API. Streaming requests ("stream": true in modelPayload) get the canned
+# answer as server-sent events over chunked transfer encoding, one word per chunk; other
+# requests get it as a single chat completion.
+#
+#   python sse_stub_server.py --port 8765 --first-token-ms 800 --token-ms 30
+#   python completions_stream.py --url http://127.0.0.1:8765/v1/completions
+#   API_URL=http://127.0.0.1:8765/v1/completions TOKEN_URL=http://127.0.0.1:8765/token \
+#       STREAM_RESPONSES=1 python ateway_cable_checker.py
+
+ANSWER = (
+    "- Top-right RJ45 (LAN 1): blue Ethernet cable, fully seated\n"
+    "- Bottom-left DSL port: grey phone cable, fully seated\n"
+    "- Power jack: black power cable, loose\n"
+    "- Fiber port: no cable"
+)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Needed for chunked transfer encoding
+    first_token_delay = 0.8
+    token_delay = 0.03
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path == "/token":
+            self.send_json({"access_token": "stub", "token_type": "Bearer", "expires_in": 3600})
+        elif self.path == "/v1/completions":
+            payload = json.loads(body or b"{}")
+            if payload.get("modelPayload", {}).get("stream"):
+                self.stream_answer()
+            else:
+                time.sleep(self.first_token_delay + self.token_delay * len(ANSWER.split(" ")))
+                self.send_json({
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER},
+                                 "finish_reason": "stop"}],
+                    "usage": self.usage(),
+                })
+        else:
+            self.send_error(404)
+
+    def usage(self):
+        completion_tokens = len(ANSWER.split(" "))
+        return {"prompt_tokens": 1000, "completion_tokens": completion_tokens, "total_tokens": 1000 + completion_tokens}
+
+    def send_json(self, data):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def send_event(self, data):
+        self.send_chunk(f"data: {json.dumps(data) if not isinstance(data, str) else data}\n\n".encode("utf-8"))
+
+    def stream_answer(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        self.send_chunk(b": keep-alive\n\n")
+        time.sleep(self.first_token_delay)
+        words = ANSWER.split(" ")
+        for index, word in enumerate(words):
+            delta = word if index == len(words) - 1 else word + " "
+            self.send_event({"choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]})
+            time.sleep(self.token_delay)
+        self.send_event({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": self.usage()})
+        self.send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub token and SSE completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--first-token-ms", type=float, default=800)
+    parser.add_argument("--token-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    StubHandler.first_token_delay = args.first_token_ms / 1000
+    StubHandler.token_delay = args.token_ms / 1000
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), StubHandler)
+    print(f"Stub API on http://127.0.0.1:{args.port} (POST /token, POST /v1/completions)")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from http_client import get_session
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+REFRESH_MARGIN = 300  # Refresh this many seconds before expiry, in the background
+DEFAULT_EXPIRES_IN = 3600  # Used only when the token response has no expires_in
+
+
+class FileLock:
+    """Exclusive lock on a side file, held across processes while the token is refreshed."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        else:
+            self._file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after ~10 seconds; keep waiting for the holder
+        return self
+
+    def __exit__(self, *exc_info):
+        if fcntl:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        else:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        self._file.close()
+        self._file = None
+
+
+class TokenProvider:
+    """OAuth client-credentials token shared by all threads and processes using one token file.
+
+    get_token() answers from memory while the token is valid. Within REFRESH_MARGIN of expiry (or
+    half the token's lifetime, if shorter) it still returns the current token and starts one background refresh; only a process with no
+    valid token at all waits for a request. Refreshes take a lock on the token file, so workers
+    starting together make one token request: the others find the new token in the file.
+    """
+
+    def __init__(self, token_url, client_id, client_secret, scope, token_file="token_info.json",
+                 refresh_margin=REFRESH_MARGIN):
+        self.token_url = token_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.scope = scope
+        self.token_file = token_file
+        self.refresh_margin = refresh_margin
+        self._token_info = None
+        self._lock = threading.Lock()  # Held while refreshing
+        self._flag_lock = threading.Lock()  # Guards _refreshing only, so callers never wait on a refresh
+        self._refreshing = False
+
+    def get_token(self):
+        token_info = self._token_info
+        now = time.time()
+        if token_info and now < token_info["expires_at"]:
+            if now >= token_info["expires_at"] - self._margin(token_info):
+                self._start_background_refresh()
+            return token_info["access_token"]
+
+        # Nothing usable in memory: wait for the file or a new token
+        with self._lock:
+            token_info = self._token_info
+            if not token_info or time.time() >= token_info["expires_at"]:
+                token_info = self._refresh()
+            return token_info["access_token"]
+
+    def _margin(self, token_info):
+        """Refresh margin, capped at half the lifetime so short-lived tokens are not refreshed on every call."""
+        lifetime = token_info.get("expires_in", DEFAULT_EXPIRES_IN)  # Missing in files written by older versions
+        return min(self.refresh_margin, lifetime / 2)
+
+    def _start_background_refresh(self):
+        with self._flag_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._background_refresh, daemon=True).start()
+
+    def _background_refresh(self):
+        try:
+            with self._lock:
+                self._refresh()
+        except Exception as e:
+            # The current token is still valid; the next get_token() near expiry tries again
+            logger.warning(f"Background token refresh failed: {e}")
+        finally:
+            with self._flag_lock:
+                self._refreshing = False
+
+    def _refresh(self):
+        """Adopt a fresh token from the file, or request one; caller holds self._lock."""
+        with FileLock(self.token_file + ".lock"):
+            token_info = self._load_file()
+            if token_info and time.time() < token_info["expires_at"] - self._margin(token_info):
+                logger.info("Reusing existing token.")
+            else:
+                token_info = self._request_token()
+                self._save_file(token_info)
+        self._token_info = token_info
+        return token_info
+
+    def _request_token(self):
+        logger.info("Generating a new token.")
+        payload = {
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+            "scope": self.scope,
+            "grant_type": "client_credentials",
+        }
+        requested_at = time.time()
+        response = get_session().post(self.token_url, data=payload)
+        response.raise_for_status()
+        token_data = response.json()
+        expires_in = int(token_data.get("expires_in", DEFAULT_EXPIRES_IN))
+        return {
+            "access_token": token_data["access_token"],
+            "expires_in": expires_in,
+            "expires_at": requested_at + expires_in,
+        }
+
+    def _load_file(self):
+        try:
+            with open(self.token_file, "r") as file:
+                token_info = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if "access_token" not in token_info or "expires_at" not in token_info:
+            return None
+        return token_info
+
+    def _save_file(self, token_info):
+        """Write via a temp file and rename, so readers never see a partial file."""
+        directory = os.path.dirname(os.path.abspath(self.token_file))
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".token_", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as file:
+                json.dump(token_info, file)
+            os.replace(temp_path, self.token_file)
+        except BaseException:
+            os.remove(temp_path)
+            raise
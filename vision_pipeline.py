@@ -0,0 +1,79 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import call_metrics
+from api_scheduler import get_scheduler
+from response_cache import get_response_cache
+
+logger = logging.getLogger(__name__)
+
+
+def load_completed(output_path):
+    """Records of jobs answered successfully by a previous, possibly interrupted, run."""
+    completed = {}
+    if os.path.exists(output_path):
+        with open(output_path, "r") as output_file:
+            for line in output_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Last line of a run that was killed mid-write
+                if "error" not in record:
+                    completed[record["id"]] = record
+    return completed
+
+
+def run_batch(jobs, process, output_path, max_workers=8):
+    """Run process(job) for every job on a bounded thread pool and return the records in job order.
+
+    Each job is a dict with a unique "id". Every finished job is appended to output_path as a JSONL
+    record ({"id", "result"} or {"id", "error"}) as soon as it completes, and jobs already answered
+    there are skipped, so rerunning an interrupted batch only processes what is left. Failed jobs
+    are retried on the next run.
+    """
+    completed = load_completed(output_path)
+    pending = [job for job in jobs if job["id"] not in completed]
+    logger.info(f"{len(jobs)} jobs: {len(jobs) - len(pending)} already done, {len(pending)} to run "
+                f"with {max_workers} workers")
+
+    write_lock = threading.Lock()
+    # Start on a fresh line if the previous run was killed mid-write
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, "rb") as output_file:
+            output_file.seek(-1, os.SEEK_END)
+            needs_newline = output_file.read(1) != b"\n"
+        if needs_newline:
+            with open(output_path, "a") as output_file:
+                output_file.write("\n")
+
+    def run_job(job):
+        try:
+            record = {"id": job["id"], "result": process(job)}
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}")
+            record = {"id": job["id"], "error": str(e)}
+        with write_lock:
+            with open(output_path, "a") as output_file:
+                output_file.write(json.dumps(record) + "\n")
+        return record
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_job, job) for job in pending]
+        for done, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            completed[record["id"]] = record
+            if done % 100 == 0 or done == len(futures):
+                logger.info(f"Finished {done}/{len(futures)} jobs")
+
+    return [completed[job["id"]] for job in jobs]
+
+
+def log_batch_stats(log=logger):
+    """Log the scheduler counters, the per-phase latency breakdown and the response cache stats."""
+    log.info(f"API scheduler: {get_scheduler().stats()}")
+    log.info(f"Call latency breakdown: {json.dumps(call_metrics.batch_summary(), indent=4)}")
+    if get_response_cache():
+        log.info(f"Response cache: {get_response_cache().stats()}")